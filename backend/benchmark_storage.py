@@ -0,0 +1,68 @@
+"""
+Compare the in-memory and SQLite storage backends
+Usage: python benchmark_storage.py [--listings N]
+"""
+from statistics import median
+import argparse
+import os
+import random
+import tempfile
+import time
+from database import MockDatabase
+from models import *
+
+def timed(func, repeat: int = 5) -> float:
+    """Median wall time of func() in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return median(samples)
+
+def make_listing(i: int, template: Property) -> Property:
+    return Property(**{**template.dict(), "id": f"BEN-{i:07d}", "price_ngn": random.randint(200000, 4000000)})
+
+def run(backend: str, path: str, listings: int) -> dict:
+    results = {}
+    start = time.perf_counter()
+    db = MockDatabase(backend=backend, path=path)
+    results["startup (seed)"] = (time.perf_counter() - start) * 1000
+
+    template = next(iter(db.properties.values()))
+    counter = iter(range(10 ** 7))
+
+    results["1k single writes"] = timed(lambda: [db.add_property(make_listing(next(counter), template)) for _ in range(1000)], repeat=3)
+
+    def batched():
+        with db.batch():
+            for _ in range(listings):
+                db.add_property(make_listing(next(counter), template))
+    results[f"{listings} batched writes"] = timed(batched, repeat=1)
+
+    ids = list(db.properties)
+    results["10k point reads"] = timed(lambda: [db.properties[random.choice(ids)] for _ in range(10000)])
+    results["filtered query"] = timed(lambda: db.query_properties(max_price=1000000, verified_only=True, limit=50))
+    results["owner listings"] = timed(lambda: db.get_owner_properties("USR-001"))
+    if db.store:
+        results["owner listings (SQL index)"] = timed(lambda: db.properties.where("owner_id", "USR-001"))
+    db.close()
+
+    if backend == "sqlite":
+        start = time.perf_counter()
+        reopened = MockDatabase(backend=backend, path=path)
+        results[f"startup (load {len(reopened.properties)})"] = (time.perf_counter() - start) * 1000
+        reopened.close()
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--listings", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in ("memory", "sqlite"):
+            random.seed(0)
+            print(f"\n{backend}")
+            for name, ms in run(backend, os.path.join(tmp, "bench.db"), args.listings).items():
+                print(f"  {name:<32} {ms:10.2f} ms")
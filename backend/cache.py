@@ -0,0 +1,136 @@
+"""
+Bounded in-process caches
+TTLCache is an LRU cache with per-entry expiry, hit/miss counters and
+optional JSON persistence so warm entries survive a restart
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+import json
+import os
+import re
+import threading
+import time
+
+_MISSING = object()
+
+def normalize_query(query: str) -> str:
+    """Case-, punctuation- and whitespace-insensitive form of a free-text query"""
+    return " ".join(re.sub(r"[^\w\s/-]", " ", query.lower()).split())
+
+class TTLCache:
+    def __init__(
+        self,
+        name: str,
+        max_size: int = 1024,
+        ttl: Optional[float] = 3600,
+        persist_path: Optional[str] = None,
+        persist_every: int = 20,
+    ):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.persist_path = persist_path
+        self.persist_every = persist_every
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        if persist_path:
+            self.load()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING, count=False) is not _MISSING
+
+    def get(self, key: Hashable, default: Any = None, count: bool = True) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] is not None and item[0] <= time.time():
+                del self._data[key]
+                item = None
+            if item is None:
+                if count:
+                    self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            if count:
+                self.hits += 1
+            return item[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = _MISSING):
+        ttl = self.ttl if ttl is _MISSING else ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+            self._unsaved += 1
+            should_save = self.persist_path and self._unsaved >= self.persist_every
+        if should_save:
+            self.save()
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._unsaved += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    # --- PERSISTENCE (JSON; keys must be strings, values JSON-serializable) ---
+    def load(self):
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Warning: could not load {self.name} cache from {self.persist_path}. Error: {e}")
+            return
+
+        now = time.time()
+        with self._lock:
+            for key, expires_at, value in entries[-self.max_size:]:
+                if expires_at is None or expires_at > now:
+                    self._data[key] = (expires_at, value)
+
+    def save(self):
+        if not self.persist_path:
+            return
+        with self._lock:
+            entries = [[key, expires_at, value] for key, (expires_at, value) in self._data.items()]
+            self._unsaved = 0
+        tmp_path = f"{self.persist_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.persist_path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Warning: could not save {self.name} cache to {self.persist_path}. Error: {e}")
@@ -0,0 +1,87 @@
+"""
+Shared outbound clients for BODI
+One pooled async HTTP client for Groq, a concurrency cap on LLM calls and a
+bounded thread pool for SDKs that only offer blocking calls (e.g. Tavily),
+so no request handler ever blocks the event loop
+"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
+import os
+import httpx
+from dotenv import load_dotenv
+from groq import AsyncGroq
+from cache import TTLCache
+
+load_dotenv()
+
+LLM_TIMEOUT_SECONDS = float(os.environ.get("LLM_TIMEOUT_SECONDS", 30))
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", 16))
+WEB_SEARCH_TIMEOUT_SECONDS = float(os.environ.get("WEB_SEARCH_TIMEOUT_SECONDS", 10))
+BLOCKING_IO_WORKERS = int(os.environ.get("BLOCKING_IO_WORKERS", 8))
+
+# Web research results change slowly; cache them per normalized query
+WEB_CACHE_SIZE = int(os.environ.get("WEB_CACHE_SIZE", 2048))
+WEB_CACHE_TTL_SECONDS = float(os.environ.get("WEB_CACHE_TTL_SECONDS", 24 * 3600))
+WEB_CACHE_PATH = os.environ.get("WEB_CACHE_PATH")  # e.g. "/var/data/tavily_cache.json"
+
+# Keep-alive pool shared by every Groq call on this worker
+http_client = httpx.AsyncClient(
+    limits=httpx.Limits(max_connections=LLM_MAX_CONCURRENCY * 2, max_keepalive_connections=LLM_MAX_CONCURRENCY),
+    timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=5.0),
+)
+
+try:
+    async_groq_client = AsyncGroq(
+        api_key=os.environ.get("GROQ_API_KEY"),
+        http_client=http_client,
+        timeout=LLM_TIMEOUT_SECONDS,
+        max_retries=1,
+    )
+except Exception as e:
+    print(f"Warning: Groq client failed. Error: {e}")
+    async_groq_client = None
+
+# Caps in-flight LLM generations (including open streams) per worker
+llm_slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+blocking_io_pool = ThreadPoolExecutor(max_workers=BLOCKING_IO_WORKERS, thread_name_prefix="bodi-io")
+
+async def create_chat_completion(**kwargs):
+    """Non-streaming Groq completion, subject to the concurrency cap"""
+    async with llm_slots:
+        return await async_groq_client.chat.completions.create(**kwargs)
+
+async def run_blocking(func, *args, timeout: float = WEB_SEARCH_TIMEOUT_SECONDS, **kwargs):
+    """Run a blocking SDK call on the bounded I/O pool with a timeout"""
+    loop = asyncio.get_running_loop()
+    return await asyncio.wait_for(loop.run_in_executor(blocking_io_pool, partial(func, *args, **kwargs)), timeout)
+
+# --- TAVILY (WEB RESEARCH) ---
+web_search_cache = TTLCache("web_search", max_size=WEB_CACHE_SIZE, ttl=WEB_CACHE_TTL_SECONDS, persist_path=WEB_CACHE_PATH)
+_tavily_client = None
+
+def get_tavily_client():
+    """Process-wide Tavily client, created on first use (None if not configured)"""
+    global _tavily_client
+    if _tavily_client is None:
+        api_key = os.environ.get("TAVILY_API_KEY")
+        if not api_key:
+            return None
+        from tavily import TavilyClient
+        _tavily_client = TavilyClient(api_key=api_key)
+    return _tavily_client
+
+async def web_search(search_query: str, cache_key: str, **kwargs) -> dict:
+    """Tavily search through the shared client, served from cache when possible"""
+    cached = web_search_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    results = await run_blocking(get_tavily_client().search, query=search_query, **kwargs)
+    web_search_cache.set(cache_key, results)
+    return results
+
+async def close_clients():
+    await http_client.aclose()
+    blocking_io_pool.shutdown(wait=False)
+    web_search_cache.save()
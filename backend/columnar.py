@@ -0,0 +1,230 @@
+"""
+Columnar (NumPy) view of the listing catalogue
+One array per filterable field, with codes for type/city/neighborhood and
+an amenity bitmask, so broad filters and aggregates run as vectorized masks
+instead of Python loops over Property objects
+"""
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from models import Property
+from property_index import SORT_FIELDS, DEFAULT_ORDER, parse_location, encode_cursor, decode_cursor
+
+INITIAL_CAPACITY = 1024
+NO_BEDROOMS = -1
+
+# field -> dtype; price and safety stay float64 so cursor keys compare exactly
+COLUMNS = {
+    "seq": np.int64,
+    "price_ngn": np.float64,
+    "safety_score": np.float64,
+    "verified": np.bool_,
+    "alive": np.bool_,
+    "type": np.int16,
+    "city": np.int32,
+    "neighborhood": np.int32,
+    "bedrooms": np.int16,
+}
+
+class PropertyColumns:
+    def __init__(self):
+        self.capacity = INITIAL_CAPACITY
+        self.size = 0  # rows in use, including deleted ones
+        self.dead = 0
+        self.arrays: Dict[str, np.ndarray] = {name: np.zeros(self.capacity, dtype) for name, dtype in COLUMNS.items()}
+        self.amenity_words = np.zeros((self.capacity, 1), np.uint64)
+
+        self.ids: List[Optional[str]] = []
+        self.row: Dict[str, int] = {}
+
+        # value -> code dictionaries (codes are never reused)
+        self.codes: Dict[str, Dict[str, int]] = {"type": {}, "city": {}, "neighborhood": {}}
+        self.amenity_bits: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self.row)
+
+    def _code(self, column: str, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        codes = self.codes[column]
+        return codes.setdefault(value, len(codes))
+
+    def _amenity_bit(self, amenity: str) -> int:
+        bit = self.amenity_bits.setdefault(amenity, len(self.amenity_bits))
+        if bit >= 64 * self.amenity_words.shape[1]:
+            extra = np.zeros((self.capacity, 1), np.uint64)
+            self.amenity_words = np.hstack([self.amenity_words, extra])
+        return bit
+
+    def _grow(self):
+        self.capacity *= 2
+        for name, array in self.arrays.items():
+            grown = np.zeros(self.capacity, array.dtype)
+            grown[:self.size] = array[:self.size]
+            self.arrays[name] = grown
+        words = np.zeros((self.capacity, self.amenity_words.shape[1]), np.uint64)
+        words[:self.size] = self.amenity_words[:self.size]
+        self.amenity_words = words
+
+    def add(self, prop: Property, seq: int):
+        """Insert or overwrite a listing's row (seq is its PropertyIndex catalogue position)"""
+        row = self.row.get(prop.id)
+        if row is None:
+            if self.size == self.capacity:
+                self._grow()
+            row = self.size
+            self.size += 1
+            self.ids.append(prop.id)
+            self.row[prop.id] = row
+
+        city, _, neighborhood_id = parse_location(prop)
+        values = {
+            "seq": seq,
+            "price_ngn": prop.price_ngn,
+            "safety_score": prop.safety_score,
+            "verified": prop.verified,
+            "alive": True,
+            "type": self._code("type", prop.type.value),
+            "city": self._code("city", city.lower()),
+            "neighborhood": self._code("neighborhood", neighborhood_id),
+            "bedrooms": NO_BEDROOMS if prop.bedrooms is None else prop.bedrooms,
+        }
+        for name, value in values.items():
+            self.arrays[name][row] = value
+
+        words = np.zeros(self.amenity_words.shape[1], np.uint64)
+        for amenity in {a.lower() for a in prop.amenities}:
+            bit = self._amenity_bit(amenity)
+            if len(words) < self.amenity_words.shape[1]:
+                words = np.append(words, np.uint64(0))
+            words[bit // 64] |= np.uint64(1) << np.uint64(bit % 64)
+        self.amenity_words[row] = words
+
+    def remove(self, property_id: str):
+        row = self.row.pop(property_id, None)
+        if row is None:
+            return
+        self.arrays["alive"][row] = False
+        self.ids[row] = None
+        self.dead += 1
+        if self.dead > INITIAL_CAPACITY and self.dead * 2 > self.size:
+            self._compact()
+
+    def _compact(self):
+        """Drop deleted rows (rows stay in catalogue order)"""
+        keep = np.flatnonzero(self.arrays["alive"][:self.size])
+        for name, array in self.arrays.items():
+            array[:len(keep)] = array[keep]
+            array[len(keep):self.size] = 0
+        self.amenity_words[:len(keep)] = self.amenity_words[keep]
+        self.amenity_words[len(keep):self.size] = 0
+        self.ids = [self.ids[i] for i in keep]
+        self.row = {pid: i for i, pid in enumerate(self.ids)}
+        self.size = len(keep)
+        self.dead = 0
+
+    def column(self, name: str) -> np.ndarray:
+        return self.arrays[name][:self.size]
+
+    # --- MASKS ---
+    def mask(
+        self,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        verified_only: bool = False,
+        types: Optional[Iterable[str]] = None,
+        amenities: Optional[Iterable[str]] = None,
+        min_bedrooms: Optional[int] = None,
+        cities: Optional[Set[str]] = None,
+        neighborhood_ids: Optional[Set[str]] = None,
+        candidates: Optional[Set[str]] = None,
+    ) -> np.ndarray:
+        """Boolean mask over rows matching every given filter"""
+        mask = self.column("alive").copy()
+        if min_price is not None:
+            mask &= self.column("price_ngn") >= min_price
+        if max_price is not None:
+            mask &= self.column("price_ngn") <= max_price
+        if verified_only:
+            mask &= self.column("verified")
+        if types:
+            mask &= self._in_codes("type", types)
+        for amenity in amenities or ():
+            bit = self.amenity_bits.get(amenity.lower())
+            if bit is None:
+                return np.zeros(self.size, np.bool_)
+            word = self.amenity_words[:self.size, bit // 64]
+            mask &= (word & (np.uint64(1) << np.uint64(bit % 64))) != 0
+        if min_bedrooms is not None:
+            mask &= self.column("bedrooms") >= min_bedrooms
+        if cities is not None or neighborhood_ids is not None:
+            mask &= self._in_codes("city", cities or ()) | self._in_codes("neighborhood", neighborhood_ids or ())
+        if candidates is not None:
+            in_candidates = np.zeros(self.size, np.bool_)
+            in_candidates[self.rows_of(candidates)] = True
+            mask &= in_candidates
+        return mask
+
+    def _in_codes(self, column: str, values: Iterable[str]) -> np.ndarray:
+        """Rows whose coded column is one of values, via a code lookup table"""
+        codes = self.codes[column]
+        # One spare slot at the end, so the -1 "no value" code maps to False
+        table = np.zeros(len(codes) + 1, np.bool_)
+        table[[codes[v] for v in values if v in codes]] = True
+        return table[self.column(column)]
+
+    def rows_of(self, property_ids: Iterable[str]) -> np.ndarray:
+        row = self.row
+        return np.fromiter((row[pid] for pid in property_ids if pid in row), np.int64)
+
+    # --- QUERIES ---
+    def query(
+        self,
+        sort: Optional[str] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        **filters,
+    ) -> Tuple[List[str], Optional[str]]:
+        """Same contract (and cursors) as PropertyIndex.query, evaluated as vectorized masks"""
+        sort_name = sort or ""
+        descending = sort_name.startswith("-")
+        if sort_name and sort_name.lstrip("-") not in SORT_FIELDS:
+            raise ValueError(f"Unsupported sort: {sort}")
+        field = SORT_FIELDS[sort_name.lstrip("-")] if sort_name else DEFAULT_ORDER
+        after = decode_cursor(cursor, sort_name) if cursor else None
+
+        mask = self.mask(**filters)
+        values = self.column(field)
+
+        tie_rows = np.empty(0, np.int64)
+        if after is not None:
+            # Keys are (value, property_id); only rows tied on value need the ID comparison
+            value, after_id = after
+            ties = np.flatnonzero(mask & (values == value))
+            tie_rows = np.array(
+                [r for r in ties if (self.ids[r] < after_id if descending else self.ids[r] > after_id)], np.int64
+            )
+            mask &= (values < value) if descending else (values > value)
+
+        rows = np.concatenate([np.flatnonzero(mask), tie_rows])
+        want = None if limit is None else limit + 1
+
+        # Cut down to the rows that can make the page (keeping every tie at the boundary)
+        if want is not None and len(rows) > want:
+            selected = values[rows]
+            if descending:
+                threshold = -np.partition(-selected, want - 1)[want - 1]
+                rows = rows[selected >= threshold]
+            else:
+                threshold = np.partition(selected, want - 1)[want - 1]
+                rows = rows[selected <= threshold]
+
+        keyed = sorted(zip(values[rows].tolist(), (self.ids[r] for r in rows.tolist())), reverse=descending)
+        if want is not None:
+            keyed = keyed[:want]
+
+        next_cursor = None
+        if limit is not None and len(keyed) > limit:
+            keyed = keyed[:limit]
+            next_cursor = encode_cursor(sort_name, keyed[-1])
+        return [pid for _, pid in keyed], next_cursor
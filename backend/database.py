@@ -2,35 +2,741 @@
 Mock Database Layer for BODI MVP
 In production, this would connect to PostgreSQL/MongoDB
 """
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set
 from models import *
 import random
+import bisect
+import functools
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from property_index import PropertyIndex, parse_location
+from search_index import TextIndex
+from spatial_index import GridIndex
+from columnar import PropertyColumns
+from serialization import FragmentCache
+from cache import TTLCache
+from idempotency import IdempotencyStore
+from geography import neighborhood_key, get_neighborhood_coordinates, expand_place_names
+from storage import SQLiteStore, TABLES, DB_BACKEND, DB_PATH
+import snapshot
+import os
+import threading
+import time
+import uuid
 
-class MockDatabase:
+# Fixed creation time for seed records, so every generated dataset is identical
+SEED_TIMESTAMP = datetime(2024, 1, 1)
+
+# Listing queries cached by canonical filters (entries go stale through versions)
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", 1024))
+CACHEABLE_FILTERS = {
+    "min_price", "max_price", "verified_only", "types", "amenities", "min_bedrooms",
+    "candidates", "predicate", "sort", "limit", "cursor",
+}
+
+# Queries that touch less than 1/COLUMNAR_MIN_FRACTION of the catalogue (small
+# candidate sets, or pages filled by a short index walk) are cheaper through the
+# PropertyIndex than as a full column mask
+COLUMNAR_MIN_FRACTION = 16
+
+# Secondary indexes map a key to an insertion-ordered set of record IDs
+# (a dict with None values), so lookups return results in creation order.
+Index = Dict[str, Dict[str, None]]
+
+def _locked(method):
+    """Run a MockDatabase method under the database lock"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+def _index_add(index: Index, key: str, record_id: str):
+    index.setdefault(key, {})[record_id] = None
+
+def _index_remove(index: Index, key: str, record_id: str):
+    bucket = index.get(key)
+    if bucket is None:
+        return
+    bucket.pop(record_id, None)
+    if not bucket:
+        del index[key]
+
+class EscrowConflict(ValueError):
+    """A status change the escrow state machine (or the expected version) does not allow"""
+
+class ReviewAggregate:
+    """Running review totals for one property"""
+    __slots__ = ("count", "total", "histogram")
+    
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.histogram = [0, 0, 0, 0, 0]  # index 0 => 1 star ... index 4 => 5 stars
+    
+    def add(self, rating: int):
+        self.count += 1
+        self.total += rating
+        self.histogram[rating - 1] += 1
+    
+    def remove(self, rating: int):
+        self.count -= 1
+        self.total -= rating
+        self.histogram[rating - 1] -= 1
+    
+    def copy(self) -> "ReviewAggregate":
+        other = ReviewAggregate()
+        other.count, other.total, other.histogram = self.count, self.total, list(self.histogram)
+        return other
+    
+    @property
+    def average(self) -> float:
+        return self.total / self.count if self.count else 0
+    
+    def to_dict(self) -> dict:
+        return {
+            "total_reviews": self.count,
+            "average_rating": self.average,
+            "histogram": {str(stars): n for stars, n in enumerate(self.histogram, start=1)}
+        }
+
+class LandlordRollup:
+    """Running listing and escrow totals for one landlord"""
+    __slots__ = ("properties", "verified", "safety_total", "total_revenue", "pending_revenue",
+                 "active_escrows", "revenue_daily", "revenue_monthly", "volume_daily", "volume_monthly")
+    
     def __init__(self):
-        self.users: Dict[str, User] = {}
-        self.properties: Dict[str, Property] = {}
-        self.escrow_transactions: Dict[str, EscrowTransaction] = {}
-        self.reviews: Dict[str, Review] = {}
-        self.location_shares: Dict[str, LocationShare] = {}
-        self.forums: Dict[str, NeighborhoodForum] = {}
-        self.service_providers: Dict[str, ServiceProvider] = {}
-        self.maintenance_requests: Dict[str, MaintenanceRequest] = {}
+        self.properties = 0
+        self.verified = 0
+        self.safety_total = 0.0
+        self.total_revenue = 0.0
+        self.pending_revenue = 0.0
+        self.active_escrows = 0
+        # Released amounts bucketed by completion date, escrowed amounts by creation date
+        self.revenue_daily: Dict[str, float] = {}
+        self.revenue_monthly: Dict[str, float] = {}
+        self.volume_daily: Dict[str, float] = {}
+        self.volume_monthly: Dict[str, float] = {}
+    
+    def add_listing(self, prop: Property, sign: int = 1):
+        self.properties += sign
+        self.verified += sign * prop.verified
+        self.safety_total += sign * prop.safety_score
+    
+    def add_escrow(self, state: tuple, sign: int = 1):
+        status, amount, created_at, completed_at = state
+        amount *= sign
+        _bucket_add(self.volume_daily, self.volume_monthly, created_at, amount)
+        if status == EscrowStatus.RELEASED:
+            self.total_revenue += amount
+            _bucket_add(self.revenue_daily, self.revenue_monthly, completed_at or created_at, amount)
+        elif status == EscrowStatus.DEPOSITED:
+            self.pending_revenue += amount
+        if status in (EscrowStatus.PENDING, EscrowStatus.DEPOSITED):
+            self.active_escrows += sign
+    
+    def copy(self) -> "LandlordRollup":
+        other = LandlordRollup()
+        for name in self.__slots__:
+            value = getattr(self, name)
+            setattr(other, name, dict(value) if isinstance(value, dict) else value)
+        return other
+    
+    def to_dict(self) -> dict:
+        return {
+            "total_properties": self.properties,
+            "verified_properties": self.verified,
+            "total_revenue": self.total_revenue,
+            "pending_revenue": self.pending_revenue,
+            "active_escrows": self.active_escrows,
+            "average_safety_score": round(self.safety_total / self.properties, 1) if self.properties else 0
+        }
+    
+    def series(self, granularity: str = "monthly") -> List[dict]:
+        """Revenue and escrow volume per day or month, oldest first"""
+        revenue = self.revenue_daily if granularity == "daily" else self.revenue_monthly
+        volume = self.volume_daily if granularity == "daily" else self.volume_monthly
+        return [
+            {"period": period, "revenue": revenue.get(period, 0), "escrow_volume": volume.get(period, 0)}
+            for period in sorted(revenue.keys() | volume.keys())
+        ]
+
+def _bucket_add(daily: Dict[str, float], monthly: Dict[str, float], when: datetime, amount: float):
+    for buckets, key in ((daily, when.strftime("%Y-%m-%d")), (monthly, when.strftime("%Y-%m"))):
+        total = buckets.get(key, 0) + amount
+        if abs(total) < 1e-6:
+            buckets.pop(key, None)
+        else:
+            buckets[key] = total
+
+class MockDatabase:
+    def __init__(self, backend: str = "memory", path: str = DB_PATH):
+        # Tables are plain dicts, or write-through SQLite mappings with the same interface
+        self.store = SQLiteStore(path) if backend == "sqlite" else None
+        # Request handlers run in a threadpool (and sync() replays other workers'
+        # writes), so index reads and writes all hold this lock. It is always taken
+        # before store.lock
+        self.lock = threading.RLock()
+        # Shared mode: change log position and database file version applied so far
+        # (read before loading the tables, so later writes are replayed, not missed)
+        self._change_seq = self.store.last_change() if self.store else 0
+        self._data_version = None
+        self.users: Dict[str, User] = self._table("users")
+        self.properties: Dict[str, Property] = self._table("properties")
+        self.escrow_transactions: Dict[str, EscrowTransaction] = self._table("escrow_transactions")
+        self.reviews: Dict[str, Review] = self._table("reviews")
+        self.location_shares: Dict[str, LocationShare] = self._table("location_shares")
+        self.forums: Dict[str, NeighborhoodForum] = self._table("forums")
+        self.service_providers: Dict[str, ServiceProvider] = self._table("service_providers")
+        self.maintenance_requests: Dict[str, MaintenanceRequest] = self._table("maintenance_requests")
+        
+        # Bumped on every listing write so derived caches know when to rebuild,
+        # globally and per place (("city", name) / ("neighborhood", neighborhood_id))
+        self.properties_version = 0
+        self.location_versions: Dict[tuple, int] = {}
+        self.query_cache = TTLCache("property_queries", max_size=QUERY_CACHE_SIZE, ttl=None)
+        
+        # Change stamps for conditional GETs: key -> (write sequence, unix time).
+        # Keys are "listings", "listing:<id>" and "reviews:<property id>"; the epoch
+        # keeps versions from one process lifetime from matching another's
+        self.epoch = uuid.uuid4().hex[:8]
+        self.started_at = time.time()
+        self.change_stamps: Dict[str, tuple] = {}
+        self._write_seq = 0
+        
+        # Secondary indexes (kept in sync by the write methods below)
+        self.properties_by_owner: Index = {}
+        self.reviews_by_property: Index = {}
+        self.escrow_by_property: Index = {}
+        self.maintenance_by_property: Index = {}
+        self.property_index = PropertyIndex()
+        self.text_index = TextIndex()
+        self.spatial_index = GridIndex()
+        self.property_columns = PropertyColumns()
+        self.providers_by_area: Index = {}
+        
+        # Pre-encoded JSON for listings and reviews served by the hot read endpoints
+        self.json_fragments = FragmentCache()
         
-        self._seed_data()
+        # Review aggregates per property, plus a ranking sorted best-first
+        # by (-average, -count, property_id)
+        self.review_stats: Dict[str, ReviewAggregate] = {}
+        self._rating_rank: List[tuple] = []
+        
+        # Landlord dashboard rollups, plus the escrow fields each one was last
+        # counted with (escrows are mutated in place before being saved)
+        self.landlord_stats: Dict[str, LandlordRollup] = {}
+        self._escrow_states: Dict[str, tuple] = {}
+        
+        # Responses of create requests by Idempotency-Key (kept in SQLite with that backend)
+        self.idempotency = IdempotencyStore(self.store)
+        
+        if not self.properties:
+            with self.batch():
+                self._seed_data()
+        self._build_indexes()
+    
+    def _table(self, name: str) -> dict:
+        return self.store.table(name) if self.store else {}
+    
+    @contextmanager
+    def batch(self):
+        """Group writes into one transaction (no-op for the in-memory backend)"""
+        with self.lock:
+            if self.store:
+                with self.store.batch():
+                    yield
+            else:
+                yield
+    
+    def close(self):
+        if self.store:
+            self.store.close()
+    
+    # --- CROSS-WORKER SYNC ---
+    def sync(self):
+        """Apply writes committed by other worker processes (shared SQLite mode)"""
+        store = self.store
+        if store is None or not store.shared:
+            return
+        with self.lock, store.lock:
+            version = store.data_version()
+            if version == self._data_version:
+                return  # nothing committed by another connection since the last check
+            self._data_version = version
+            changes, complete = store.changes_since(self._change_seq)
+            if not complete:
+                self._reload()
+                return
+            if changes:
+                self._change_seq = changes[-1][0]
+            # Each changed record is applied once, in its latest stored state
+            changed = dict.fromkeys((table, record_id) for _, table, record_id, origin in changes if origin != store.origin)
+            with store.replay():
+                for table, record_id in changed:
+                    self._apply_change(table, record_id)
+    
+    def _apply_change(self, table: str, record_id: str):
+        """Bring one record (and every index and cache derived from it) up to date"""
+        records = getattr(self, table)
+        record = records.fetch(record_id)
+        if table == "properties":
+            if record is None:
+                if record_id in self.properties:
+                    self.remove_property(record_id)
+            elif record_id in self.properties:
+                self.update_property(record_id, record.dict())
+            else:
+                self.add_property(record)
+            return
+        
+        writers = {
+            "reviews": self.add_review,
+            "escrow_transactions": self.add_escrow,
+            "maintenance_requests": self.add_maintenance_request,
+        }
+        if record is None:
+            records.pop(record_id, None)  # only unindexed tables have delete paths
+        elif table in writers:
+            writers[table](record)
+        else:
+            records[record_id] = record
+    
+    def _reload(self):
+        """Re-read every table after falling behind the pruned change log"""
+        self._change_seq = self.store.last_change()
+        for name in TABLES:
+            getattr(self, name).reload()
+        self._build_indexes()
+        self.json_fragments = FragmentCache()
+        self.properties_version += 1
+        self.location_versions = {}
+        # New epoch: every ETag handed out before the reload is stale
+        self.epoch = uuid.uuid4().hex[:8]
+        self.started_at = time.time()
+        self.change_stamps = {}
+    
+    def _build_indexes(self):
+        """Rebuild all secondary indexes from the primary tables"""
+        self.properties_by_owner = {}
+        self.reviews_by_property = {}
+        self.escrow_by_property = {}
+        self.maintenance_by_property = {}
+        self.review_stats = {}
+        self.query_cache.clear()
+        self.landlord_stats = {}
+        self._escrow_states = {}
+        self.property_index = PropertyIndex()
+        self.text_index = TextIndex()
+        self.spatial_index = GridIndex()
+        self.property_columns = PropertyColumns()
+        self.providers_by_area = {}
+        
+        for prop in self.properties.values():
+            _index_add(self.properties_by_owner, prop.owner_id, prop.id)
+            self._index_listing(prop)
+            self._landlord(prop.owner_id).add_listing(prop)
+        for review in self.reviews.values():
+            _index_add(self.reviews_by_property, review.property_id, review.id)
+            self.review_stats.setdefault(review.property_id, ReviewAggregate()).add(review.rating)
+        self._rating_rank = sorted(
+            self._rank_key(pid, stats) for pid, stats in self.review_stats.items() if stats.count
+        )
+        for escrow in self.escrow_transactions.values():
+            _index_add(self.escrow_by_property, escrow.property_id, escrow.id)
+            self._rollup_escrow(escrow)
+        for request in self.maintenance_requests.values():
+            _index_add(self.maintenance_by_property, request.property_id, request.id)
+        for provider in self.service_providers.values():
+            for area in provider.service_area:
+                _index_add(self.providers_by_area, area.lower(), provider.id)
+    
+    # --- WRITE PATHS ---
+    @_locked
+    def add_property(self, prop: Property):
+        """Insert or replace a property, keeping the owner index in sync"""
+        if prop.id in self.properties:
+            self.remove_property(prop.id)
+        self.properties[prop.id] = prop
+        _index_add(self.properties_by_owner, prop.owner_id, prop.id)
+        self._index_listing(prop)
+        self._landlord(prop.owner_id).add_listing(prop)
+        self._listing_changed(prop)
+    
+    @_locked
+    def update_property(self, property_id: str, updates: dict) -> Property:
+        """Apply field updates to a property and re-index changed keys"""
+        old = self.properties[property_id]
+        old_owner = old.owner_id
+        changes = {k: v for k, v in updates.items() if k != "id" and hasattr(old, k)}
+        moved = changes.get("location", old.location) != old.location
+        if moved:
+            # Fields derived from the old location would keep the listing indexed
+            # there: re-derive the neighborhood and fall back to its centre
+            changes.setdefault("neighborhood_id", None)
+            changes.setdefault("latitude", None)
+            changes.setdefault("longitude", None)
+        # Re-validate so indexed fields keep their declared types
+        prop = Property(**{**old.dict(), **changes})
+        if moved and prop.neighborhood_id is None:
+            _, _, prop.neighborhood_id = parse_location(prop)
+        self.properties[property_id] = prop
+        if prop.owner_id != old_owner:
+            _index_remove(self.properties_by_owner, old_owner, property_id)
+            _index_add(self.properties_by_owner, prop.owner_id, property_id)
+        self._landlord(old_owner).add_listing(old, sign=-1)
+        self._landlord(prop.owner_id).add_listing(prop)
+        self._index_listing(prop)
+        self._listing_changed(prop, old)
+        return prop
+    
+    @_locked
+    def remove_property(self, property_id: str) -> Property:
+        """Delete a property listing"""
+        prop = self.properties.pop(property_id)
+        _index_remove(self.properties_by_owner, prop.owner_id, property_id)
+        self._unindex_listing(property_id)
+        self._landlord(prop.owner_id).add_listing(prop, sign=-1)
+        self._listing_changed(prop)
+        return prop
+    
+    def _listing_changed(self, prop: Property, old: Optional[Property] = None):
+        self.properties_version += 1
+        for listing in (prop, old):
+            if listing is not None:
+                city, _, neighborhood_id = parse_location(listing)
+                for place in (("city", city.lower()), ("neighborhood", neighborhood_id)):
+                    self.location_versions[place] = self.location_versions.get(place, 0) + 1
+        self._touch("listings", f"listing:{prop.id}")
+    
+    def _touch(self, *keys: str):
+        self._write_seq += 1
+        stamp = (self._write_seq, time.time())
+        for key in keys:
+            self.change_stamps[key] = stamp
+    
+    @_locked
+    def change_stamp(self, *keys: str) -> tuple:
+        """(version tag, last-modified unix time) of the newest change to any of keys"""
+        seq, modified = max(self.change_stamps.get(key, (0, self.started_at)) for key in keys)
+        return f"{self.epoch}.{seq}", modified
+    
+    def _index_listing(self, prop: Property):
+        """(Re-)index a listing in the query, columnar, full-text and spatial indexes"""
+        self.property_index.add(prop)
+        self.property_columns.add(prop, self.property_index.seq(prop.id))
+        self.json_fragments.invalidate("Property", prop.id)
+        self.text_index.add(prop)
+        coordinates = property_coordinates(prop)
+        if coordinates:
+            self.spatial_index.add(prop.id, *coordinates)
+        else:
+            self.spatial_index.remove(prop.id)
+    
+    def _unindex_listing(self, property_id: str):
+        self.property_index.remove(property_id)
+        self.property_columns.remove(property_id)
+        self.json_fragments.invalidate("Property", property_id)
+        self.text_index.remove(property_id)
+        self.spatial_index.remove(property_id)
+    
+    @_locked
+    def add_review(self, review: Review):
+        """Insert a review, index it by property and update its aggregates"""
+        existing = self.reviews.get(review.id)
+        if existing is not None:
+            self._update_review_stats(existing.property_id, existing.rating, removed=True)
+        self._replace_indexed(self.reviews, self.reviews_by_property, review)
+        self._update_review_stats(review.property_id, review.rating)
+        self._touch(f"reviews:{review.property_id}", *([f"reviews:{existing.property_id}"] if existing else []))
+    
+    @staticmethod
+    def _rank_key(property_id: str, stats: ReviewAggregate) -> tuple:
+        return (-stats.average, -stats.count, property_id)
+    
+    def _update_review_stats(self, property_id: str, rating: int, removed: bool = False):
+        stats = self.review_stats.setdefault(property_id, ReviewAggregate())
+        if stats.count:
+            old_key = self._rank_key(property_id, stats)
+            pos = bisect.bisect_left(self._rating_rank, old_key)
+            if pos < len(self._rating_rank) and self._rating_rank[pos] == old_key:
+                del self._rating_rank[pos]
+        
+        if removed:
+            stats.remove(rating)
+        else:
+            stats.add(rating)
+        
+        if stats.count:
+            bisect.insort(self._rating_rank, self._rank_key(property_id, stats))
+        else:
+            del self.review_stats[property_id]
+    
+    @_locked
+    def add_escrow(self, escrow: EscrowTransaction):
+        """Insert an escrow transaction, index it by property and roll it up for its landlord"""
+        self._replace_indexed(self.escrow_transactions, self.escrow_by_property, escrow)
+        self._rollup_escrow(escrow)
+    
+    @_locked
+    def save_escrow(self, escrow: EscrowTransaction):
+        """Persist in-place changes to an escrow transaction (e.g. a status change)"""
+        self.add_escrow(escrow)
+    
+    def transition_escrow(self, transaction_id: str, status: EscrowStatus, expected_version: Optional[int] = None) -> EscrowTransaction:
+        """Move an escrow to status if ESCROW_TRANSITIONS allows it and it is still at expected_version"""
+        with self.lock:
+            self.sync()  # another worker may have moved it already
+            escrow = self.escrow_transactions[transaction_id]
+            if expected_version is not None and escrow.version != expected_version:
+                raise EscrowConflict(f"Escrow is at version {escrow.version}, not {expected_version}")
+            if status not in ESCROW_TRANSITIONS[escrow.status]:
+                raise EscrowConflict(f"Cannot move escrow from {escrow.status.value} to {status.value}")
+            
+            changes = {"status": status, "version": escrow.version + 1}
+            if status in (EscrowStatus.RELEASED, EscrowStatus.REFUNDED):
+                changes["completed_at"] = datetime.now()
+            # A new object, so readers holding the old one never see a half-applied change
+            updated = escrow.copy(update=changes)
+            if self.store is None:
+                self.save_escrow(updated)
+                return updated
+            
+            # The lock only covers this process: SQLite re-checks version and state in
+            # the same statement that writes, so a competing worker's change wins cleanly
+            predecessors = [before for before, after in ESCROW_TRANSITIONS.items() if status in after]
+            if not self.escrow_transactions.swap(transaction_id, updated, escrow.version, predecessors):
+                self.sync()
+                raise EscrowConflict(f"Escrow {transaction_id} was changed by another request; reload it and retry")
+            with self.store.replay():
+                self.add_escrow(updated)  # already stored: just indexes and rollups
+            return updated
+    
+    def _landlord(self, landlord_id: str) -> LandlordRollup:
+        stats = self.landlord_stats.get(landlord_id)
+        if stats is None:
+            stats = self.landlord_stats[landlord_id] = LandlordRollup()
+        return stats
+    
+    def _rollup_escrow(self, escrow: EscrowTransaction):
+        """Move an escrow's contribution from its previously counted state to its current one"""
+        previous = self._escrow_states.get(escrow.id)
+        if previous is not None:
+            self._landlord(previous[0]).add_escrow(previous[1:], sign=-1)
+        state = (escrow.landlord_id, escrow.status, escrow.amount_ngn, escrow.created_at, escrow.completed_at)
+        self._escrow_states[escrow.id] = state
+        self._landlord(escrow.landlord_id).add_escrow(state[1:])
+    
+    @_locked
+    def save_user(self, user: User):
+        self.users[user.id] = user
+    
+    @_locked
+    def add_maintenance_request(self, request: MaintenanceRequest):
+        """Insert a maintenance request and index it by property"""
+        self._replace_indexed(self.maintenance_requests, self.maintenance_by_property, request)
+    
+    def _replace_indexed(self, table: dict, index: Index, record):
+        existing = table.get(record.id)
+        if existing is not None:
+            _index_remove(index, existing.property_id, existing.id)
+        table[record.id] = record
+        _index_add(index, record.property_id, record.id)
+    
+    # --- INDEXED READS ---
+    @_locked
+    def query_properties(self, location: Optional[str] = None, **filters) -> tuple:
+        """
+        Run a listing query; returns (properties, next_cursor)
+        Plain filter queries are served from the result cache while the cities
+        they cover are unchanged
+        """
+        key = self._query_cache_key(location, filters)
+        cached = self.query_cache.get(key) if key is not None else None
+        if cached is None:
+            cached = self._run_query(location, filters)
+            if key is not None:
+                self.query_cache.set(key, cached)
+        ids, next_cursor = cached
+        return [self.properties[pid] for pid in ids], next_cursor
+    
+    def _query_cache_key(self, location: Optional[str], filters: dict) -> Optional[tuple]:
+        """Canonical (versions, filters) key, or None for queries we don't cache"""
+        if any(name not in CACHEABLE_FILTERS or (name in ("candidates", "predicate") and value is not None)
+               for name, value in filters.items()):
+            return None
+        
+        cities, neighborhood_ids = self.property_index.resolve_neighborhoods(location) if location else (set(), set())
+        scope = sorted([("city", city) for city in cities] + [("neighborhood", nid) for nid in neighborhood_ids])
+        # Location queries only go stale when one of their places changes
+        if scope:
+            versions = tuple((place, self.location_versions.get(place, 0)) for place in scope)
+        else:
+            versions = self.properties_version
+        return (
+            versions,
+            bool(location),
+            frozenset(cities),
+            frozenset(neighborhood_ids),
+            filters.get("min_price"),
+            filters.get("max_price"),
+            bool(filters.get("verified_only")),
+            tuple(sorted(set(filters.get("types") or ()))),
+            tuple(sorted({a.lower() for a in filters.get("amenities") or ()})),
+            filters.get("min_bedrooms"),
+            filters.get("sort") or None,
+            filters.get("limit"),
+            filters.get("cursor"),
+        )
+    
+    def _run_query(self, location: Optional[str], filters: dict) -> tuple:
+        """
+        Queries the PropertyIndex answers cheaply (a small candidate set, or a page
+        it can fill after a short walk) go there, as do custom predicates; the rest
+        run as vectorized masks over the column store
+        """
+        candidates = filters.get("candidates")
+        if location:
+            location_ids = self.property_index.location_ids(location)
+            candidates = location_ids if candidates is None else location_ids & candidates
+        
+        total = len(self.properties)
+        limit = filters.get("limit")
+        fraction = self.property_index.estimate_fraction(**{**filters, "candidates": candidates})
+        expected_walk = total if limit is None else min(total, (limit + 1) / max(fraction, 1 / max(total, 1)))
+        use_index = (
+            filters.get("predicate") is not None
+            or (candidates is not None and len(candidates) * COLUMNAR_MIN_FRACTION < total)
+            or expected_walk * COLUMNAR_MIN_FRACTION < total
+        )
+        if use_index:
+            ids, next_cursor = self.property_index.query(**{**filters, "candidates": candidates})
+        else:
+            if location:
+                filters["cities"], filters["neighborhood_ids"] = self.property_index.resolve_neighborhoods(location)
+            ids, next_cursor = self.property_columns.query(**filters)
+        return ids, next_cursor
+    
+    @_locked
+    def get_service_providers(self, service_type: Optional[str] = None, area: Optional[str] = None) -> List[ServiceProvider]:
+        """Providers serving an area (or its city/neighborhoods), optionally by service type"""
+        if area:
+            provider_ids = {}
+            for name in expand_place_names(area):
+                provider_ids.update(self.providers_by_area.get(name, {}))
+            providers = [self.service_providers[pid] for pid in provider_ids]
+        else:
+            providers = list(self.service_providers.values())
+        
+        if service_type:
+            providers = [p for p in providers if p.service_type == service_type]
+        return providers
+    
+    @_locked
+    def search_properties(self, query: str, limit: int = 10) -> List[tuple]:
+        """Keyword search over listings; returns (property, score) pairs, best first"""
+        return [(self.properties[pid], score) for pid, score in self.text_index.search(query, limit)]
+    
+    @_locked
+    def location_ids(self, location: str) -> Set[str]:
+        """Property IDs located in a place (a copy of the index entry)"""
+        return self.property_index.location_ids(location)
+    
+    @_locked
+    def listing_cities(self) -> List[str]:
+        """Lowercased cities that currently have listings"""
+        return list(self.property_index.by_city)
+    
+    @_locked
+    def text_scores(self, text: str, property_ids: List[str]) -> Dict[str, float]:
+        return self.text_index.score(text, property_ids)
+    
+    @_locked
+    def properties_near(self, lat: float, lon: float, radius_km: float, limit: Optional[int] = None) -> List[tuple]:
+        """(property, distance_km) pairs within radius_km, nearest first"""
+        return [(self.properties[pid], d) for pid, d in self.spatial_index.within_radius(lat, lon, radius_km, limit)]
+    
+    @_locked
+    def properties_in_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float, limit: Optional[int] = None) -> List[Property]:
+        """Listings inside the box in catalogue order, at most limit of them"""
+        ids = set(self.spatial_index.within_bbox(min_lat, min_lon, max_lat, max_lon))
+        properties, _ = self.query_properties(candidates=ids, limit=limit)
+        return properties
+    
+    @_locked
+    def get_owner_properties(self, owner_id: str) -> List[Property]:
+        return [self.properties[pid] for pid in self.properties_by_owner.get(owner_id, ())]
+    
+    @_locked
+    def get_property_reviews(self, property_id: str) -> List[Review]:
+        return [self.reviews[rid] for rid in self.reviews_by_property.get(property_id, ())]
+    
+    @_locked
+    def get_review_stats(self, property_id: str) -> ReviewAggregate:
+        stats = self.review_stats.get(property_id)
+        return stats.copy() if stats else ReviewAggregate()
+    
+    @_locked
+    def get_top_rated(self, limit: int = 10, min_reviews: int = 1) -> List[tuple]:
+        """Return (property, stats) pairs for the best-rated live listings"""
+        results = []
+        for _, _, property_id in self._rating_rank:
+            if len(results) >= limit:
+                break
+            stats = self.review_stats[property_id]
+            if stats.count < min_reviews or property_id not in self.properties:
+                continue
+            results.append((self.properties[property_id], stats.copy()))
+        return results
+    
+    @_locked
+    def get_landlord_rollup(self, landlord_id: str) -> LandlordRollup:
+        """A copy of the landlord's rollup, safe to read while writes continue"""
+        stats = self.landlord_stats.get(landlord_id)
+        return stats.copy() if stats else LandlordRollup()
+    
+    @_locked
+    def get_owner_escrows(self, owner_id: str) -> List[EscrowTransaction]:
+        return [
+            self.escrow_transactions[tid]
+            for pid in self.properties_by_owner.get(owner_id, ())
+            for tid in self.escrow_by_property.get(pid, ())
+        ]
+    
+    @_locked
+    def get_owner_maintenance_requests(self, owner_id: str) -> List[MaintenanceRequest]:
+        return [
+            self.maintenance_requests[rid]
+            for pid in self.properties_by_owner.get(owner_id, ())
+            for rid in self.maintenance_by_property.get(pid, ())
+        ]
     
     def _seed_data(self):
-        """Populate with mock data"""
+        """Populate with mock data, loaded from the dataset snapshot when it is current"""
+        for name, records in snapshot.load_or_build(self.generate_seed_tables, self.seed_sources()).items():
+            getattr(self, name).update(records)
+    
+    @staticmethod
+    def seed_sources() -> tuple:
+        """What the seed dataset is generated from (a snapshot built from other code is stale)"""
+        return (MockDatabase.generate_seed_tables, MockDatabase._generate_properties, SEED_TIMESTAMP)
+    
+    @staticmethod
+    def generate_seed_tables(seed: int) -> Dict[str, dict]:
+        """Deterministically generate the mock dataset for a seed"""
+        rng = random.Random(seed)
+        tables = {}
+        
         # Mock Users
-        self.users = {
+        tables["users"] = {
             "USR-001": User(
                 id="USR-001",
                 name="Chinedu Okafor",
                 email="chinedu@example.com",
                 phone="+234-808-123-4567",
                 verification_level=VerificationLevel.NIN_BVN,
-                trust_score=850
+                trust_score=850,
+                created_at=SEED_TIMESTAMP
             ),
             "USR-002": User(
                 id="USR-002",
@@ -38,15 +744,16 @@ class MockDatabase:
                 email="aisha@example.com",
                 phone="+234-809-987-6543",
                 verification_level=VerificationLevel.VIDEO,
-                trust_score=920
+                trust_score=920,
+                created_at=SEED_TIMESTAMP
             )
         }
         
         # Generate 100 Properties
-        self.properties = self._generate_properties()
+        tables["properties"] = MockDatabase._generate_properties(rng)
         
         # Mock Service Providers
-        self.service_providers = {
+        tables["service_providers"] = {
             "SP-001": ServiceProvider(
                 id="SP-001",
                 name="Emeka the Plumber",
@@ -68,17 +775,20 @@ class MockDatabase:
         }
         
         # Mock Reviews
-        self.reviews = {
+        tables["reviews"] = {
             "REV-001": Review(
                 id="REV-001",
                 property_id="LAG-001",
                 reviewer_id="USR-002",
                 rating=5,
-                comment="Amazing place! Landlord is very responsive. No issues with power."
+                comment="Amazing place! Landlord is very responsive. No issues with power.",
+                created_at=SEED_TIMESTAMP
             )
         }
+        return tables
 
-    def _generate_properties(self) -> Dict[str, Property]:
+    @staticmethod
+    def _generate_properties(rng: random.Random) -> Dict[str, Property]:
         """Generate 100 diverse properties"""
         
         # Nigerian cities and neighborhoods
@@ -132,15 +842,15 @@ class MockDatabase:
             city_code = city[:3].upper()
             
             # Generate 15-20 properties per city
-            properties_per_city = random.randint(15, 20)
+            properties_per_city = rng.randint(15, 20)
             
             for _ in range(properties_per_city):
                 if property_counter > 100:
                     break
                     
                 prop_id = f"{city_code}-{property_counter:03d}"
-                prop_type = random.choice(property_types)
-                neighborhood = random.choice(neighborhoods)
+                prop_type = rng.choice(property_types)
+                neighborhood = rng.choice(neighborhoods)
                 
                 # Price ranges based on type and city
                 price_multiplier = 1.0
@@ -150,28 +860,29 @@ class MockDatabase:
                     price_multiplier = 2.5
                 
                 base_prices = {
-                    PropertyType.STUDIO: random.randint(200000, 400000),
-                    PropertyType.FLAT: random.randint(350000, 600000),
-                    PropertyType.APARTMENT: random.randint(600000, 1200000),
-                    PropertyType.BUNGALOW: random.randint(800000, 1500000),
-                    PropertyType.DUPLEX: random.randint(1500000, 4000000)
+                    PropertyType.STUDIO: rng.randint(200000, 400000),
+                    PropertyType.FLAT: rng.randint(350000, 600000),
+                    PropertyType.APARTMENT: rng.randint(600000, 1200000),
+                    PropertyType.BUNGALOW: rng.randint(800000, 1500000),
+                    PropertyType.DUPLEX: rng.randint(1500000, 4000000)
                 }
                 
                 price = int(base_prices[prop_type] * price_multiplier)
                 
                 # Amenities (3-6 random amenities)
-                num_amenities = random.randint(3, 6)
-                selected_amenities = random.sample(amenities_pool, num_amenities)
+                num_amenities = rng.randint(3, 6)
+                selected_amenities = rng.sample(amenities_pool, num_amenities)
                 
                 # Safety score (higher for verified properties)
-                is_verified = random.random() > 0.3  # 70% verified
-                safety_score = round(random.uniform(7.0, 10.0) if is_verified else random.uniform(6.0, 8.5), 1)
+                is_verified = rng.random() > 0.3  # 70% verified
+                safety_score = round(rng.uniform(7.0, 10.0) if is_verified else rng.uniform(6.0, 8.5), 1)
                 
                 # Title
-                title_template = random.choice(property_titles[prop_type])
+                title_template = rng.choice(property_titles[prop_type])
                 bedrooms = ""
+                bedroom_count = 0 if prop_type == PropertyType.STUDIO else None
                 if prop_type in [PropertyType.APARTMENT, PropertyType.DUPLEX, PropertyType.BUNGALOW]:
-                    bedroom_count = random.randint(1, 4)
+                    bedroom_count = rng.randint(1, 4)
                     bedrooms = f"{bedroom_count}-Bedroom "
                 
                 title = f"{bedrooms}{title_template} in {neighborhood}"
@@ -184,10 +895,17 @@ class MockDatabase:
                     f"Newly renovated {prop_type.value}. Perfect for young professionals.",
                     f"Affordable {prop_type.value} in a peaceful neighborhood."
                 ]
-                description = random.choice(descriptions)
+                description = rng.choice(descriptions)
                 
                 # Owner
-                owner_id = random.choice(["USR-001", "USR-002"])
+                owner_id = rng.choice(["USR-001", "USR-002"])
+                
+                # Coordinates: scattered within ~1km of the neighborhood centre
+                latitude = longitude = None
+                centre = get_neighborhood_coordinates(neighborhood, city)
+                if centre:
+                    latitude = round(centre[0] + rng.uniform(-0.008, 0.008), 6)
+                    longitude = round(centre[1] + rng.uniform(-0.008, 0.008), 6)
                 
                 properties[prop_id] = Property(
                     id=prop_id,
@@ -199,14 +917,41 @@ class MockDatabase:
                     verified=is_verified,
                     safety_score=safety_score,
                     owner_id=owner_id,
-                    image_urls=[random.choice(image_urls)],
+                    image_urls=[rng.choice(image_urls)],
                     amenities=selected_amenities,
-                    neighborhood_id=f"{city_code}-{neighborhood.replace(' ', '-').upper()}"
+                    neighborhood_id=neighborhood_key(city, neighborhood),
+                    bedrooms=bedroom_count,
+                    latitude=latitude,
+                    longitude=longitude
                 )
                 
                 property_counter += 1
         
         return properties
 
-# Global instance
-db = MockDatabase()
+def property_coordinates(prop: Property):
+    """A listing's own coordinates, falling back to its neighborhood's centre"""
+    if prop.latitude is not None and prop.longitude is not None:
+        return prop.latitude, prop.longitude
+    city, neighborhood, _ = parse_location(prop)
+    return get_neighborhood_coordinates(neighborhood, city) if neighborhood else None
+
+class LazyDatabase:
+    """Stands in for the MockDatabase and builds it on first attribute access"""
+    
+    def __init__(self, factory):
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+    
+    def _load(self) -> MockDatabase:
+        with self._lock:
+            if self._instance is None:
+                self._instance = self._factory()
+        return self._instance
+    
+    def __getattr__(self, name):
+        return getattr(self._instance or self._load(), name)
+
+# Global instance, loaded on first use (DB_BACKEND=sqlite persists to DB_PATH)
+db = LazyDatabase(lambda: MockDatabase(backend=DB_BACKEND))
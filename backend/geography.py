@@ -2,6 +2,9 @@
 Nigerian Geographic Knowledge Base
 Used for semantic location understanding and proximity searches
 """
+import hashlib
+import json
+import re
 
 # Nigerian Cities and Neighborhoods with geographic/proximity data
 NIGERIAN_GEOGRAPHY = {
@@ -197,6 +200,62 @@ NIGERIAN_GEOGRAPHY = {
     }
 }
 
+# Approximate neighborhood centroids (latitude, longitude), including cities
+# we list in but don't have a full knowledge-base entry for yet
+NEIGHBORHOOD_COORDINATES = {
+    "Lagos": {
+        "Yaba": (6.5095, 3.3711),
+        "Ikeja": (6.6018, 3.3515),
+        "Lekki": (6.4478, 3.4723),
+        "Victoria Island": (6.4281, 3.4219),
+        "Surulere": (6.5005, 3.3581),
+        "Ikoyi": (6.4520, 3.4350),
+        "Maryland": (6.5720, 3.3670),
+        "Gbagada": (6.5560, 3.3880),
+        "Ajah": (6.4670, 3.5700),
+        "Magodo": (6.6210, 3.3830),
+        "Akoka": (6.5240, 3.3920),
+        "Ebute Metta": (6.4880, 3.3800),
+    },
+    "Abuja": {
+        "Wuse 2": (9.0790, 7.4700),
+        "Maitama": (9.0880, 7.4950),
+        "Garki": (9.0300, 7.4900),
+        "Asokoro": (9.0440, 7.5250),
+        "Gwarinpa": (9.1100, 7.4040),
+        "Kubwa": (9.1550, 7.3220),
+        "Jabi": (9.0680, 7.4240),
+        "Utako": (9.0720, 7.4430),
+    },
+    "Ibadan": {
+        "Bodija": (7.4320, 3.9140),
+        "Agodi": (7.4000, 3.9150),
+        "Ring Road": (7.3640, 3.8790),
+        "UI": (7.4440, 3.8990),
+        "Challenge": (7.3490, 3.8820),
+        "Apata": (7.3800, 3.8200),
+    },
+    "Port Harcourt": {
+        "GRA": (4.8156, 7.0080),
+        "Trans Amadi": (4.8100, 7.0400),
+        "Rumuokoro": (4.8700, 6.9900),
+        "D-Line": (4.8080, 7.0010),
+        "Old GRA": (4.7770, 7.0130),
+    },
+    "Kano": {
+        "Nassarawa": (12.0000, 8.5400),
+        "Sabon Gari": (12.0150, 8.5300),
+        "Gwale": (11.9900, 8.4950),
+        "Fagge": (12.0100, 8.5150),
+    },
+    "Enugu": {
+        "GRA": (6.4550, 7.5000),
+        "Independence Layout": (6.4400, 7.5100),
+        "Trans-Ekulu": (6.4800, 7.5250),
+        "New Haven": (6.4500, 7.5180),
+    },
+}
+
 # Common search terms and their meanings
 LOCATION_ALIASES = {
     "VI": "Victoria Island",
@@ -212,17 +271,251 @@ LOCATION_ALIASES = {
     "Aso Rock": "Asokoro"
 }
 
+PROXIMITY_KEYWORDS = ["near", "close to", "around", "nearby", "vicinity of"]
+
+PREFERENCE_KEYWORDS = {
+    "affordable": "budget-friendly",
+    "cheap": "budget-friendly",
+    "budget": "budget-friendly",
+    "luxury": "upscale",
+    "upscale": "upscale",
+    "expensive": "upscale",
+    "high-end": "upscale",
+    "premium": "upscale",
+    "quiet": "peaceful residential",
+    "peaceful": "peaceful residential",
+    "student": "student-friendly",
+    "students": "student-friendly",
+    "family": "family-friendly",
+    "families": "family-friendly",
+    "secure": "gated/secure",
+    "gated": "gated/secure"
+}
+
+def _trie_regex(terms) -> str:
+    """
+    Compile terms into one prefix-factored alternation, e.g. ["lekki", "lekki phase 1"]
+    -> "lekki(?: phase 1)?". Matching cost depends on the query, not the vocabulary size
+    """
+    trie: dict = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def render(node: dict) -> str:
+        branches = [re.escape(ch) + render(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            return f"(?:{body})?"
+        return body
+
+    return render(trie)
+
+def _word_pattern(terms) -> "re.Pattern":
+    # Word boundaries that also work for terms like "D-Line" or "Phase 1 & 2"
+    return re.compile(r"(?<![a-z0-9])(" + _trie_regex(terms) + r")(?![a-z0-9])")
+
+def _compile():
+    """
+    Build the single-pass location matcher from the knowledge base
+    Every alias, city, neighborhood, landmark, proximity and preference term maps to
+    the context entries it produces
+    """
+    global _ALIASES_LOWER, _ALIAS_PATTERN, _VOCABULARY, _MATCHER
+    _ALIASES_LOWER = {alias.lower(): location for alias, location in LOCATION_ALIASES.items()}
+    _ALIAS_PATTERN = _word_pattern(_ALIASES_LOWER)
+
+    places_by_name: dict = {}
+    for city_name, city_data in NIGERIAN_GEOGRAPHY.items():
+        places_by_name.setdefault(city_name.lower(), []).append(("city", city_name))
+        for neighborhood in city_data["neighborhoods"]:
+            places_by_name.setdefault(neighborhood.lower(), []).append(("neighborhood", (neighborhood, city_name)))
+
+    vocabulary: dict = {}
+    def add(term: str, entry: tuple):
+        entries = vocabulary.setdefault(" ".join(term.lower().split()), [])
+        if entry not in entries:
+            entries.append(entry)
+
+    for name, entries in places_by_name.items():
+        for entry in entries:
+            add(name, entry)
+    for alias, location in LOCATION_ALIASES.items():
+        for entry in places_by_name.get(location.lower(), []):
+            add(alias, entry)
+    for city_name, city_data in NIGERIAN_GEOGRAPHY.items():
+        for neighborhood, details in city_data["neighborhoods"].items():
+            for landmark in details.get("landmarks", []):
+                add(landmark, ("landmark", (landmark, neighborhood, city_name)))
+    for keyword in PROXIMITY_KEYWORDS:
+        add(keyword, ("proximity", keyword))
+    for keyword, category in PREFERENCE_KEYWORDS.items():
+        add(keyword, ("preference", category))
+
+    _VOCABULARY = vocabulary
+    _MATCHER = _word_pattern(vocabulary)
+    _build_proximity_graph()
+    _build_place_hierarchy()
+
+# --- PLACE HIERARCHY ---
+def neighborhood_key(city_name: str, neighborhood_name: str) -> str:
+    """
+    Build the neighborhood_id used on listings, e.g. ("Port Harcourt", "Old GRA") -> "POR-OLD-GRA"
+    """
+    return f"{city_name[:3].upper()}-{neighborhood_name.replace(' ', '-').upper()}"
+
+def _build_place_hierarchy():
+    """City <-> neighborhood containment from the knowledge base (lowercased names)"""
+    global _CITY_NEIGHBORHOODS, _NEIGHBORHOOD_CITIES, _NEIGHBORHOOD_IDS
+    city_neighborhoods: dict = {}
+    neighborhood_cities: dict = {}
+    neighborhood_ids: dict = {}
+    for city_name, city_data in NIGERIAN_GEOGRAPHY.items():
+        city = city_name.lower()
+        city_neighborhoods[city] = set()
+        for name in city_data["neighborhoods"]:
+            city_neighborhoods[city].add(name.lower())
+            neighborhood_cities.setdefault(name.lower(), set()).add(city)
+            neighborhood_ids[neighborhood_key(city_name, name)] = (name.lower(), city)
+
+    _CITY_NEIGHBORHOODS = city_neighborhoods
+    _NEIGHBORHOOD_CITIES = neighborhood_cities
+    _NEIGHBORHOOD_IDS = neighborhood_ids
+
+def neighborhood_place(neighborhood_id: str):
+    """(neighborhood, city) lowercased for a knowledge-base neighborhood_id, else None"""
+    return _NEIGHBORHOOD_IDS.get(neighborhood_id.upper())
+
+def expand_place_names(location: str) -> set:
+    """
+    Lowercased place names covering a location: a neighborhood ("Yaba", "GRA, Enugu"
+    or "POR-GRA") expands to itself plus its city, a city to itself plus its
+    neighborhoods. Unknown places are returned as they are
+    """
+    parts = [canonical_location_name(part).lower() for part in location.split(",") if part.strip()]
+    if len(parts) > 1:
+        name, city = parts[0], parts[-1]
+        if city in _NEIGHBORHOOD_CITIES.get(name, ()):
+            return {name, city}
+    elif parts:
+        key = parts[0]
+        if key.upper() in _NEIGHBORHOOD_IDS:
+            return set(_NEIGHBORHOOD_IDS[key.upper()])
+        if key in _CITY_NEIGHBORHOODS:
+            return {key} | _CITY_NEIGHBORHOODS[key]
+        if key in _NEIGHBORHOOD_CITIES:
+            return {key} | _NEIGHBORHOOD_CITIES[key]
+    return {canonical_location_name(location).lower()}
+
+# --- NEIGHBORHOOD PROXIMITY GRAPH ---
+# Hop distances are precomputed up to this horizon; farther pairs count as unrelated
+MAX_PRECOMPUTED_HOPS = 4
+
+def _build_proximity_graph():
+    """
+    Build a symmetric neighborhood graph from the "nearby" lists (nodes are
+    (city, neighborhood) pairs) and precompute hop distances with one BFS per node
+    """
+    global _ADJACENCY, _HOP_DISTANCES, _NODES_BY_NAME
+    adjacency: dict = {}  # node -> ordered set of neighbor nodes
+    for city_name, city_data in NIGERIAN_GEOGRAPHY.items():
+        for name, details in city_data["neighborhoods"].items():
+            node = (city_name, name)
+            adjacency.setdefault(node, {})
+            for nearby in details.get("nearby", []):
+                other = (city_name, nearby)
+                if other != node:
+                    adjacency[node][other] = None
+                    adjacency.setdefault(other, {})[node] = None
+
+    distances: dict = {}
+    for source in adjacency:
+        hops = {source: 0}
+        frontier = [source]
+        for depth in range(1, MAX_PRECOMPUTED_HOPS + 1):
+            next_frontier = []
+            for node in frontier:
+                for neighbor in adjacency[node]:
+                    if neighbor not in hops:
+                        hops[neighbor] = depth
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+        distances[source] = hops
+
+    nodes_by_name: dict = {}
+    for city_name, name in adjacency:
+        nodes_by_name.setdefault(name.lower(), []).append((city_name, name))
+
+    _ADJACENCY = adjacency
+    _HOP_DISTANCES = distances
+    _NODES_BY_NAME = nodes_by_name
+
+def resolve_neighborhood(area: str) -> list:
+    """
+    Resolve "Yaba", "unilag" or "GRA, Port Harcourt" to the matching (city, neighborhood) graph nodes
+    """
+    parts = [canonical_location_name(part) for part in area.split(",") if part.strip()]
+    if not parts:
+        return []
+    nodes = _NODES_BY_NAME.get(parts[0].lower(), [])
+    if len(parts) > 1:
+        nodes = [node for node in nodes if node[0].lower() == parts[-1].lower()]
+    return list(nodes)
+
+def neighborhood_distance(neighborhood_a: str, neighborhood_b: str, city_name: str):
+    """Hop distance between two neighborhoods of a city (None if unrelated within the horizon)"""
+    return _HOP_DISTANCES.get((city_name, neighborhood_a), {}).get((city_name, neighborhood_b))
+
+def neighborhoods_within(neighborhood_name: str, city_name: str, max_hops: int = 2) -> dict:
+    """
+    All neighborhoods within max_hops of a neighborhood, as {name: hops}, nearest first
+    (the neighborhood itself is included at distance 0)
+    """
+    hops = _HOP_DISTANCES.get((city_name, neighborhood_name), {})
+    return {name: distance for (_, name), distance in hops.items() if distance <= max_hops}
+
+def _fingerprint() -> str:
+    payload = json.dumps([NIGERIAN_GEOGRAPHY, LOCATION_ALIASES, PREFERENCE_KEYWORDS, NEIGHBORHOOD_COORDINATES], sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()[:12]
+
+_compile()
+
+# Changes whenever the knowledge base changes; caches derived from it key on this
+GEOGRAPHY_VERSION = _fingerprint()
+
+def refresh_geography_version() -> str:
+    """Recompile the matcher and recompute GEOGRAPHY_VERSION after editing the knowledge base at runtime"""
+    global GEOGRAPHY_VERSION
+    _compile()
+    GEOGRAPHY_VERSION = _fingerprint()
+    return GEOGRAPHY_VERSION
+
+def resolve_aliases(text: str) -> str:
+    """
+    Replace known aliases in lowercased text with their canonical names
+    e.g. "flat near unilag" -> "flat near yaba"
+    """
+    return _ALIAS_PATTERN.sub(lambda m: _ALIASES_LOWER[m.group(1)].lower(), text)
+
+def canonical_location_name(name: str) -> str:
+    """
+    Resolve a user-supplied place name through LOCATION_ALIASES
+    Returns the canonical name, or the stripped input if it is not an alias
+    """
+    name = " ".join(name.split())
+    return _ALIASES_LOWER.get(name.lower(), name)
+
 def get_location_context(query: str) -> dict:
     """
     Extract location context from a search query
-    Returns city, neighborhood, and proximity information
+    Returns city, neighborhood, landmark, proximity and preference information
+    from a single pass of the compiled matcher over the query
     """
-    query_lower = query.lower()
-    
-    # Check for aliases
-    for alias, location in LOCATION_ALIASES.items():
-        if alias.lower() in query_lower:
-            query_lower = query_lower.replace(alias.lower(), location.lower())
+    query_lower = " ".join(query.lower().split())
     
     context = {
         "cities": [],
@@ -231,52 +524,52 @@ def get_location_context(query: str) -> dict:
         "proximity_hints": [],
         "preferences": []
     }
+    seen = set()
     
-    # Detect cities
-    for city in NIGERIAN_GEOGRAPHY.keys():
-        if city.lower() in query_lower:
-            context["cities"].append(city)
-    
-    # Detect neighborhoods
-    for city_name, city_data in NIGERIAN_GEOGRAPHY.items():
-        for neighborhood, details in city_data["neighborhoods"].items():
-            if neighborhood.lower() in query_lower:
-                context["neighborhoods"].append({
-                    "name": neighborhood,
-                    "city": city_name,
-                    "details": details
-                })
-    
-    # Detect proximity keywords
-    proximity_keywords = ["near", "close to", "around", "nearby", "vicinity of"]
-    for keyword in proximity_keywords:
-        if keyword in query_lower:
-            context["proximity_hints"].append(keyword)
+    def add_neighborhood(name: str, city_name: str):
+        if ("neighborhood", name, city_name) not in seen:
+            seen.add(("neighborhood", name, city_name))
+            context["neighborhoods"].append({
+                "name": name,
+                "city": city_name,
+                "details": NIGERIAN_GEOGRAPHY[city_name]["neighborhoods"][name]
+            })
     
-    # Detect preference keywords
-    preference_map = {
-        "affordable": "budget-friendly",
-        "cheap": "budget-friendly",
-        "luxury": "upscale",
-        "upscale": "upscale",
-        "quiet": "peaceful residential",
-        "peaceful": "peaceful residential",
-        "student": "student-friendly",
-        "family": "family-friendly",
-        "secure": "gated/secure",
-        "gated": "gated/secure"
-    }
-    
-    for keyword, category in preference_map.items():
-        if keyword in query_lower:
-            if category not in context["preferences"]:
-                context["preferences"].append(category)
+    for match in _MATCHER.finditer(query_lower):
+        for kind, value in _VOCABULARY[match.group(1)]:
+            if kind == "neighborhood":
+                add_neighborhood(*value)
+            elif kind == "landmark":
+                landmark, name, city_name = value
+                if ("landmark", landmark) not in seen:
+                    seen.add(("landmark", landmark))
+                    context["landmarks"].append({"name": landmark, "neighborhood": name, "city": city_name})
+                add_neighborhood(name, city_name)
+            elif (kind, value) not in seen:
+                seen.add((kind, value))
+                key = {"city": "cities", "proximity": "proximity_hints", "preference": "preferences"}[kind]
+                context[key].append(value)
     
     return context
 
-def find_nearby_neighborhoods(neighborhood_name: str, city_name: str) -> list:
+def get_location_contexts(queries: list) -> list:
+    """
+    Batch version of get_location_context
+    Repeated queries (after case/whitespace folding) are matched once
+    """
+    resolved: dict = {}
+    results = []
+    for query in queries:
+        key = " ".join(query.lower().split())
+        if key not in resolved:
+            resolved[key] = get_location_context(key)
+        results.append(resolved[key])
+    return results
+
+def find_nearby_neighborhoods(neighborhood_name: str, city_name: str, max_hops: int = 1) -> list:
     """
-    Given a neighborhood, return nearby neighborhoods
+    Given a neighborhood, return nearby neighborhoods (nearest first)
+    Uses the symmetric proximity graph, so "A is near B" also makes B near A
     """
     if city_name not in NIGERIAN_GEOGRAPHY:
         return []
@@ -284,8 +577,14 @@ def find_nearby_neighborhoods(neighborhood_name: str, city_name: str) -> list:
     if neighborhood_name not in NIGERIAN_GEOGRAPHY[city_name]["neighborhoods"]:
         return []
     
-    nearby = NIGERIAN_GEOGRAPHY[city_name]["neighborhoods"][neighborhood_name].get("nearby", [])
-    return nearby
+    nearby = neighborhoods_within(neighborhood_name, city_name, max_hops)
+    return [name for name, hops in nearby.items() if hops > 0]
+
+def get_neighborhood_coordinates(neighborhood_name: str, city_name: str):
+    """
+    Approximate (latitude, longitude) of a neighborhood, or None if unknown
+    """
+    return NEIGHBORHOOD_COORDINATES.get(city_name, {}).get(neighborhood_name)
 
 def get_neighborhood_info(neighborhood_name: str, city_name: str) -> dict:
     """
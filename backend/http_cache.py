@@ -0,0 +1,45 @@
+"""
+Conditional GET support
+Responses carry a weak ETag and Last-Modified derived from the database's
+change stamps, so clients revalidate with If-None-Match / If-Modified-Since
+and get a bodiless 304 while the data is unchanged
+"""
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import Request, Response
+import time
+
+def cache_headers(tag: str, modified: float) -> dict:
+    headers = {
+        "ETag": f'W/"{tag}"',
+        # Clients may keep the body but must revalidate before reusing it
+        "Cache-Control": "no-cache",
+    }
+    # Last-Modified has whole-second resolution: a later write in the same second
+    # would compare equal to it and earn a stale 304, so it is only sent once that
+    # second is over (the ETag covers revalidation until then)
+    if int(modified) < int(time.time()):
+        headers["Last-Modified"] = formatdate(modified, usegmt=True)
+    return headers
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" match
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+def is_not_modified(request: Request, tag: str, modified: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, f'W/"{tag}"')
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(modified) <= since
+    return False
+
+def not_modified_response(tag: str, modified: float) -> Response:
+    return Response(status_code=304, headers=cache_headers(tag, modified))
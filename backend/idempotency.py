@@ -0,0 +1,101 @@
+"""
+Idempotency-Key support for the create endpoints
+A client that retries a write sends the same Idempotency-Key header: the first
+request runs, and repeats within IDEMPOTENCY_TTL get the stored response back
+(marked Idempotent-Replayed) instead of creating another record. Keys live in a
+bounded in-process TTLCache, or in SQLite with the SQLite backend so that every
+worker, and a restarted one, sees them
+"""
+from typing import Any, Callable, Optional
+import hashlib
+import os
+import threading
+import time
+from fastapi import HTTPException
+from pydantic import BaseModel
+from cache import TTLCache
+from serialization import RawJSONResponse, dumps
+
+IDEMPOTENCY_TTL = float(os.environ.get("IDEMPOTENCY_TTL", 24 * 3600))
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get("IDEMPOTENCY_CACHE_SIZE", 10000))
+# How long a key stays reserved by a request that is still running (or died)
+IN_FLIGHT_TTL = 60
+MAX_KEY_LENGTH = 255
+PRUNE_EVERY = 1000
+
+class IdempotencyStore:
+    def __init__(self, store=None, max_size: int = IDEMPOTENCY_CACHE_SIZE, ttl: float = IDEMPOTENCY_TTL):
+        self.store = store  # SQLiteStore, or None for the in-process cache
+        self.ttl = ttl
+        # key -> (request fingerprint, status code, body); status is None while in flight
+        self.responses = TTLCache("idempotency_keys", max_size=max_size, ttl=ttl)
+        self.replays = 0
+        self._claims = 0
+        self._lock = threading.Lock()
+
+    def _claim(self, key: str, fingerprint: str) -> Optional[tuple]:
+        """Reserve key, or return the entry already stored for it"""
+        if self.store is not None:
+            self._claims += 1
+            if self._claims % PRUNE_EVERY == 0:
+                self.store.prune_keys()
+            return self.store.claim_key(key, fingerprint, time.time() + IN_FLIGHT_TTL)
+        with self._lock:
+            entry = self.responses.get(key, count=False)
+            if entry is None:
+                self.responses.set(key, (fingerprint, None, None), ttl=IN_FLIGHT_TTL)
+            return entry
+
+    def _complete(self, key: str, fingerprint: str, status: int, body: bytes):
+        if self.store is not None:
+            self.store.complete_key(key, status, body, time.time() + self.ttl)
+        else:
+            self.responses.set(key, (fingerprint, status, body))
+
+    def _release(self, key: str):
+        if self.store is not None:
+            self.store.release_key(key)
+            return
+        with self._lock:
+            entry = self.responses.get(key, count=False)
+            if entry is not None and entry[1] is None:
+                self.responses.pop(key)
+
+    def run(self, scope: str, key: Optional[str], payload: BaseModel, handler: Callable[[], Any]):
+        """Call handler() once per (scope, key); repeats of the same request replay its response"""
+        if key is None:
+            return handler()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+
+        key = f"{scope}:{key}"
+        # Only the fields the client sent: defaults like created_at=datetime.now differ per retry
+        fingerprint = hashlib.sha256(dumps(payload.dict(exclude_unset=True))).hexdigest()
+        entry = self._claim(key, fingerprint)
+        if entry is not None:
+            stored_fingerprint, status, body = entry
+            if stored_fingerprint != fingerprint:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+            if status is None:
+                raise HTTPException(
+                    status_code=409,
+                    detail="A request with this Idempotency-Key is still being processed",
+                    headers={"Retry-After": "1"},
+                )
+            self.replays += 1
+            return RawJSONResponse(body, status_code=status, headers={"Idempotent-Replayed": "true"})
+
+        try:
+            result = handler()
+        except BaseException:
+            # Failed requests (e.g. a 404) can be retried with the same key
+            self._release(key)
+            raise
+        body = dumps(result)
+        self._complete(key, fingerprint, 200, body)
+        return RawJSONResponse(body)
+
+    def stats(self) -> dict:
+        if self.store is not None:
+            return {"name": "idempotency_keys", "storage": "sqlite", "replays": self.replays}
+        return {**self.responses.stats(), "storage": "memory", "replays": self.replays}
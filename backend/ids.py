@@ -0,0 +1,64 @@
+"""
+Record ID allocation
+IDs are "<PREFIX>-<ULID>": a 48-bit millisecond timestamp plus 80 random bits in
+Crockford base32. They sort by creation time, the random part makes collisions
+between threads and worker processes negligible, and within a process IDs are
+strictly increasing even when several are issued in the same millisecond
+"""
+from datetime import datetime
+from typing import Optional, Tuple
+import os
+import threading
+import time
+
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"  # Crockford base32
+ULID_LENGTH = 26
+RANDOM_BITS = 80
+
+_DECODE = {char: value for value, char in enumerate(ALPHABET)}
+_lock = threading.Lock()
+_last_ms = -1
+_last_random = 0
+
+def _encode(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, 32)
+        chars.append(ALPHABET[digit])
+    return "".join(reversed(chars))
+
+def new_ulid() -> str:
+    """Monotonic ULID: same-millisecond IDs increment the random part"""
+    global _last_ms, _last_random
+    with _lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms <= _last_ms:
+            now_ms = _last_ms
+            _last_random += 1
+            if _last_random >= 1 << RANDOM_BITS:  # overflow: borrow the next millisecond
+                now_ms += 1
+                _last_random = int.from_bytes(os.urandom(10), "big")
+        else:
+            _last_random = int.from_bytes(os.urandom(10), "big")
+        _last_ms = now_ms
+        return _encode((now_ms << RANDOM_BITS) | _last_random, ULID_LENGTH)
+
+def new_id(prefix: str) -> str:
+    """e.g. new_id("REV") -> "REV-01J9ZQ4K7V3M8X2B5N6C1D0E9F" """
+    return f"{prefix}-{new_ulid()}"
+
+def id_timestamp(record_id: str) -> Optional[datetime]:
+    """Creation time encoded in an allocated ID (None for legacy IDs like "REV-001")"""
+    ulid = record_id.rpartition("-")[2]
+    if len(ulid) != ULID_LENGTH or any(char not in _DECODE for char in ulid):
+        return None
+    value = 0
+    for char in ulid[:10]:
+        value = value * 32 + _DECODE[char]
+    return datetime.fromtimestamp(value / 1000)
+
+def id_range(prefix: str, start: datetime, end: datetime) -> Tuple[str, str]:
+    """(low, high) bounds so that low <= record_id < high selects IDs created in [start, end)"""
+    def bound(moment: datetime) -> str:
+        return f"{prefix}-{_encode(int(moment.timestamp() * 1000) << RANDOM_BITS, ULID_LENGTH)}"
+    return bound(start), bound(end)
@@ -1,20 +1,33 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Optional
-import os
-import random
+import json
 from dotenv import load_dotenv
-from groq import Groq
 from datetime import datetime
+from pydantic import ValidationError
 from models import *
-from database import db
+from database import db, EscrowConflict
+from storage import DB_SHARED
+from property_index import InvalidCursor
+from retrieval import retrieve_listings, CHAT_TOP_K, BUDGET_MAX_PRICE, LUXURY_MIN_PRICE
+from clients import async_groq_client, create_chat_completion, llm_slots, close_clients
+from clients import get_tavily_client, web_search, web_search_cache
+from cache import TTLCache, normalize_query
+from http_cache import cache_headers, is_not_modified, not_modified_response
+from compression import CompressionMiddleware
+from ids import new_id, id_range
+from serialization import FastJSONResponse, RawJSONResponse, dumps, json_array, extend_object
+import geography
 
 load_dotenv()
 
 app = FastAPI(
     title="BODI Backend",
     description="Conversational AI Housing Platform - Full Feature Set",
-    version="2.0"
+    version="2.0",
+    default_response_class=FastJSONResponse
 )
 
 # CORS Setup
@@ -24,22 +37,78 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified", "Idempotent-Replayed"],
 )
+# gzip/brotli for complete responses over COMPRESSION_MIN_BYTES
+app.add_middleware(CompressionMiddleware)
+
+# With DB_SHARED=1, pick up other workers' writes before handling each request
+# (a PRAGMA check when nothing changed; see MockDatabase.sync). Replaying
+# writes takes the database lock, so it runs off the event loop
+if DB_SHARED:
+    @app.middleware("http")
+    async def sync_shared_state(request: Request, call_next):
+        await run_in_threadpool(db.sync)
+        return await call_next(request)
 
 # --- GROQ CLIENT SETUP ---
-try:
-    groq_client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
-except Exception as e:
-    print(f"Warning: Groq client failed. Error: {e}")
-    groq_client = None
+# The Groq client is async, pooled and concurrency-capped (see clients.py)
+@app.on_event("shutdown")
+async def shutdown_clients():
+    await close_clients()
+    db.close()
+
+CHAT_MODEL = "llama-3.3-70b-versatile"
 
 # --- HELPER FUNCTIONS ---
-def get_ai_system_prompt(language: str = "en"):
-    """Generate context-aware system prompt"""
-    properties_context = "\n".join([
-        f"- {p.title} in {p.location} ({p.type.value}) @ ₦{p.price_ngn:,}. Verified: {p.verified}. Safety: {p.safety_score}/10. ID: {p.id}"
-        for p in db.properties.values()
-    ])
+# Rendered prompt template per language; listings are spliced in per request
+_system_prompt_cache: dict = {}
+LISTINGS_PLACEHOLDER = "\x00LISTINGS\x00"
+# How many recent user turns feed listing retrieval
+RETRIEVAL_TURNS = 3
+# Parsed semantic-search understanding per canonical query; keys include the
+# geography version, so editing the knowledge base invalidates old entries
+understanding_cache = TTLCache("query_understanding", max_size=1024, ttl=6 * 3600)
+# Semantic search answers from the local knowledge base at or above this confidence
+LOCAL_CONFIDENCE_THRESHOLD = 0.7
+# Rendered listing line per property ID, tagged with the Property instance it was built from
+_listing_line_cache: dict = {}
+
+def format_listing_line(p: Property) -> str:
+    """Render one listing for the chat context, reusing the cached line if the listing is unchanged"""
+    cached = _listing_line_cache.get(p.id)
+    if cached is not None and cached[0] is p:
+        return cached[1]
+    line = f"- {p.title} in {p.location} ({p.type.value}) @ ₦{p.price_ngn:,}. Verified: {p.verified}. Safety: {p.safety_score}/10. ID: {p.id}"
+    _listing_line_cache[p.id] = (p, line)
+    return line
+
+def format_listings_context(listings: List[Property]) -> str:
+    """Render the retrieved listings block for the system prompt"""
+    if len(_listing_line_cache) > 2 * max(len(db.properties), CHAT_TOP_K):
+        with db.lock:
+            stale_ids = _listing_line_cache.keys() - db.properties.keys()
+        for stale_id in stale_ids:
+            _listing_line_cache.pop(stale_id, None)
+    
+    header = f"(The {len(listings)} listings most relevant to this conversation, out of {len(db.properties)} on BODI)"
+    return "\n".join([header] + [format_listing_line(p) for p in listings])
+
+def get_ai_system_prompt(language: str = "en", listings: Optional[List[Property]] = None):
+    """Generate context-aware system prompt from a cached per-language template"""
+    # Only two templates exist: never let client-supplied strings grow the cache
+    language = "pidgin" if language == "pidgin" else "en"
+    template = _system_prompt_cache.get(language)
+    if template is None:
+        template = _build_system_prompt_template(language)
+        _system_prompt_cache[language] = template
+    
+    if listings is None:
+        listings = retrieve_listings("")
+    return template.replace(LISTINGS_PLACEHOLDER, format_listings_context(listings))
+
+def _build_system_prompt_template(language: str) -> str:
+    properties_context = LISTINGS_PLACEHOLDER
     
     base_prompt = f"""
     You are BODI, an AI housing assistant for Nigeria with INTERNET ACCESS. Your tone is warm, helpful, and trustworthy.
@@ -95,6 +164,7 @@ def get_ai_system_prompt(language: str = "en"):
     - If discussing payments, emphasize ESCROW protection
     - If user seems worried about fraud, reassure with verification + escrow + safety toolkit
     - Recommend properties from the list above when relevant
+    - The list above is pre-filtered for this conversation; if nothing there fits, say so and ask the user to refine their search
     """
     
     if language == "pidgin":
@@ -102,6 +172,18 @@ def get_ai_system_prompt(language: str = "en"):
     
     return base_prompt
 
+def build_chat_messages(request: ChatRequest) -> list:
+    """System prompt with retrieved listings, followed by the conversation"""
+    recent_turns = [m.content for m in request.messages if m.role == "user"][-RETRIEVAL_TURNS:]
+    listings = retrieve_listings(" ".join(recent_turns))
+    system_prompt = get_ai_system_prompt(request.language, listings)
+    return [{"role": "system", "content": system_prompt}] + [m.dict() for m in request.messages]
+
+def sse_event(data: dict, event: Optional[str] = None) -> str:
+    """Format one Server-Sent Event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
 # --- ENDPOINTS ---
 
 @app.get("/")
@@ -111,53 +193,184 @@ def root():
 # === PROPERTY ENDPOINTS ===
 @app.get("/api/properties", response_model=List[Property])
 def get_properties(
+    request: Request,
     location: Optional[str] = None,
+    min_price: Optional[float] = None,
     max_price: Optional[float] = None,
-    verified_only: bool = False
+    verified_only: bool = False,
+    type: Optional[List[PropertyType]] = Query(None),
+    amenities: Optional[List[str]] = Query(None),
+    min_bedrooms: Optional[int] = Query(None, ge=0),
+    sort: Optional[str] = Query(None, pattern="^-?(price|safety_score)$"),
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    cursor: Optional[str] = None
 ):
-    """Get all properties with optional filters"""
-    properties = list(db.properties.values())
+    """
+    Get properties with optional filters, sorting and cursor pagination
+    When more results remain, the next page's cursor is sent in the X-Next-Cursor header
+    """
+    tag, modified = db.change_stamp("listings")
+    if is_not_modified(request, tag, modified):
+        return not_modified_response(tag, modified)
     
-    if location:
-        properties = [p for p in properties if location.lower() in p.location.lower()]
-    if max_price:
-        properties = [p for p in properties if p.price_ngn <= max_price]
-    if verified_only:
-        properties = [p for p in properties if p.verified]
+    try:
+        properties, next_cursor = db.query_properties(
+            min_price=min_price,
+            max_price=max_price,
+            verified_only=verified_only,
+            types=[t.value for t in type] if type else None,
+            amenities=amenities,
+            min_bedrooms=min_bedrooms,
+            location=location,
+            sort=sort,
+            limit=limit,
+            cursor=cursor
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Assembled from pre-encoded listings; the response_model only documents the shape
+    headers = cache_headers(tag, modified)
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return RawJSONResponse(db.json_fragments.array(properties), headers=headers)
+
+@app.get("/api/properties/top-rated")
+def get_top_rated_properties(limit: int = 10, min_reviews: int = 1):
+    """Get the best-rated listings, ranked by average rating then review count"""
+    return RawJSONResponse(json_array(
+        extend_object(db.json_fragments.get(p), {"avg_rating": stats.average, "total_reviews": stats.count})
+        for p, stats in db.get_top_rated(limit=limit, min_reviews=min_reviews)
+    ))
+
+@app.get("/api/properties/search")
+def search_properties(q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=50)):
+    """Keyword search over titles, descriptions, amenities and locations (BM25-ranked)"""
+    results = db.search_properties(q, limit=limit)
+    properties = json_array(extend_object(db.json_fragments.get(p), {"score": score}) for p, score in results)
+    return RawJSONResponse(extend_object(dumps({"query": q, "total": len(results)}), raw={"properties": properties}))
+
+@app.get("/api/properties/near")
+def get_properties_near_point(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(2.0, gt=0, le=100),
+    limit: int = Query(50, ge=1, le=200)
+):
+    """Listings within radius_km of a point, nearest first"""
+    return RawJSONResponse(json_array(
+        extend_object(db.json_fragments.get(p), {"distance_km": distance})
+        for p, distance in db.properties_near(lat, lon, radius_km, limit=limit)
+    ))
+
+@app.get("/api/properties/within")
+def get_properties_in_bbox(
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lon: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lon: float = Query(..., ge=-180, le=180),
+    limit: int = Query(200, ge=1, le=500)
+):
+    """Listings inside a map viewport (bounding box), at most limit of them"""
+    if min_lat > max_lat or min_lon > max_lon:
+        raise HTTPException(status_code=400, detail="Invalid bounding box")
+    return RawJSONResponse(db.json_fragments.array(db.properties_in_bbox(min_lat, min_lon, max_lat, max_lon, limit=limit)))
+
+@app.get("/api/properties/nearby")
+def get_properties_nearby(
+    area: str,
+    max_hops: int = Query(2, ge=0, le=geography.MAX_PRECOMPUTED_HOPS),
+    max_price: Optional[float] = None,
+    verified_only: bool = False,
+    limit: int = Query(20, ge=1, le=100)
+):
+    """Listings in and around a neighborhood, nearest neighborhoods first"""
+    nodes = geography.resolve_neighborhood(area)
+    if not nodes:
+        raise HTTPException(status_code=404, detail="Unknown neighborhood")
+    
+    # Group candidate listings into rings by hop distance from the area
+    rings = {}
+    for city, name in nodes:
+        for neighborhood, hops in geography.neighborhoods_within(name, city, max_hops).items():
+            ids = db.location_ids(f"{neighborhood}, {city}")
+            if ids:
+                rings.setdefault(hops, set()).update(ids)
+    
+    results = []
+    seen = set()
+    for hops in sorted(rings):
+        if len(results) >= limit:
+            break
+        properties, _ = db.query_properties(
+            candidates=rings[hops] - seen,
+            max_price=max_price,
+            verified_only=verified_only,
+            limit=limit - len(results)
+        )
+        for p in properties:
+            seen.add(p.id)
+            results.append(extend_object(db.json_fragments.get(p), {"hops": hops}))
+    return RawJSONResponse(json_array(results))
+
+@app.get("/api/neighborhoods/nearby")
+def get_nearby_neighborhoods(area: str, max_hops: int = Query(2, ge=1, le=geography.MAX_PRECOMPUTED_HOPS)):
+    """Neighborhoods within max_hops of an area, with their hop distance"""
+    nodes = geography.resolve_neighborhood(area)
+    if not nodes:
+        raise HTTPException(status_code=404, detail="Unknown neighborhood")
     
-    return properties
+    return {
+        "area": area,
+        "matches": [
+            {
+                "name": name,
+                "city": city,
+                "nearby": [
+                    {"name": neighborhood, "hops": hops}
+                    for neighborhood, hops in geography.neighborhoods_within(name, city, max_hops).items()
+                    if hops > 0
+                ]
+            }
+            for city, name in nodes
+        ]
+    }
 
 @app.get("/api/properties/{property_id}")
-def get_property_detail(property_id: str):
+def get_property_detail(property_id: str, request: Request):
     """Get detailed property info with reviews"""
     if property_id not in db.properties:
         raise HTTPException(status_code=404, detail="Property not found")
     
+    tag, modified = db.change_stamp(f"listing:{property_id}", f"reviews:{property_id}")
+    if is_not_modified(request, tag, modified):
+        return not_modified_response(tag, modified)
+    
     property_data = db.properties[property_id]
-    property_reviews = [r for r in db.reviews.values() if r.property_id == property_id]
+    reviews = db.json_fragments.array(db.get_property_reviews(property_id))
     
-    return {
-        **property_data.dict(),
-        "reviews": property_reviews,
-        "avg_rating": sum(r.rating for r in property_reviews) / len(property_reviews) if property_reviews else 0
-    }
+    return RawJSONResponse(extend_object(
+        db.json_fragments.get(property_data),
+        {"avg_rating": db.get_review_stats(property_id).average},
+        raw={"reviews": reviews}
+    ), headers=cache_headers(tag, modified))
 
 # === CHAT ENDPOINT (AI) ===
 @app.post("/api/chat")
 async def chat_endpoint(request: ChatRequest):
     """Conversational AI with language support"""
-    if not groq_client:
+    if not async_groq_client:
         return {
             "response": "Abeg, my brain (API key) no dey available now. Configure am make I fit think properly!",
             "language": request.language
         }
     
     try:
-        system_prompt = get_ai_system_prompt(request.language)
-        messages = [{"role": "system", "content": system_prompt}] + [m.dict() for m in request.messages]
+        # Retrieval takes the database lock, so it runs off the event loop
+        messages = await run_in_threadpool(build_chat_messages, request)
         
-        completion = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
+        completion = await create_chat_completion(
+            model=CHAT_MODEL,
             messages=messages,
             temperature=0.7,
             max_tokens=600,
@@ -174,118 +387,255 @@ async def chat_endpoint(request: ChatRequest):
         print(f"Groq Error: {e}")
         return {"response": "Network issue. Please try again.", "error": str(e)}
 
+@app.post("/api/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest, http_request: Request):
+    """
+    Conversational AI streamed as Server-Sent Events
+    Emits {"token": ...} events as Groq produces them, then a "done" event.
+    If the client disconnects, the upstream generation is closed.
+    """
+    sse_headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    
+    if not async_groq_client:
+        async def unavailable():
+            yield sse_event({"token": "Abeg, my brain (API key) no dey available now. Configure am make I fit think properly!"})
+            yield sse_event({"language": request.language}, event="done")
+        return StreamingResponse(unavailable(), media_type="text/event-stream", headers=sse_headers)
+    
+    messages = await run_in_threadpool(build_chat_messages, request)
+    
+    async def event_stream():
+        stream = None
+        # Hold an LLM slot for the whole generation, not just the initial request
+        async with llm_slots:
+            try:
+                stream = await async_groq_client.chat.completions.create(
+                    model=CHAT_MODEL,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=600,
+                    top_p=1,
+                    stream=True,
+                )
+                async for chunk in stream:
+                    if await http_request.is_disconnected():
+                        break
+                    token = chunk.choices[0].delta.content if chunk.choices else None
+                    if token:
+                        yield sse_event({"token": token})
+                else:
+                    yield sse_event({"language": request.language}, event="done")
+            except Exception as e:
+                print(f"Groq Error: {e}")
+                yield sse_event({"error": "Network issue. Please try again."}, event="error")
+            finally:
+                # Runs on normal completion, errors and client disconnects (generator cancelled)
+                if stream is not None:
+                    await stream.close()
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=sse_headers)
+
 # === SEMANTIC SEARCH ENDPOINT ===
-@app.post("/api/search/semantic")
-async def semantic_search(query: str):
+async def understand_search_query(query: str) -> dict:
     """
-    AI-powered semantic search with real-time internet access via Tavily
-    Verifies location claims and gathers contextual information before searching properties
+    Research a query on the web and have the LLM turn it into search parameters
+    Returns the web research, the raw AI understanding and the parsed search locations
     """
-    from tavily import TavilyClient
+    # Step 1: Use Tavily to research the location/context mentioned in query
+    search_query = f"Nigeria real estate {query} location information neighborhoods"
+    
+    tavily_results = await web_search(
+        search_query,
+        cache_key=normalize_query(query),
+        search_depth="basic",
+        max_results=3
+    )
+    
+    # Extract web context
+    web_context = "\n".join([
+        f"- {result['title']}: {result['content'][:200]}..."
+        for result in tavily_results.get('results', [])
+    ])
+    
+    # Step 2: Use AI to understand query with web-verified context
+    understanding_prompt = f"""
+    You are a Nigerian real estate search assistant with access to the internet.
+    
+    User Query: "{query}"
+    
+    Web Research Results:
+    {web_context}
     
-    # Initialize Tavily client
-    tavily_api_key = os.environ.get("TAVILY_API_KEY")
-    if not tavily_api_key:
-        return {"error": "Tavily API key not configured"}
+    Based on the query and web research:
+    1. What specific locations/neighborhoods should I search? (Be specific about cities and areas)
+    2. If the user mentioned proximity (near/close to), what are the actual nearby neighborhoods?
+    3. What are the user's preferences? (price range, property type, amenities)
+    4. Are there any claims I should verify? (e.g., "close to university" - which university? which neighborhoods?)
     
-    tavily = TavilyClient(api_key=tavily_api_key)
+    Respond in this exact format:
+    **Search Locations**: [comma-separated list of specific neighborhoods/cities]
+    **Nearby Areas**: [if proximity mentioned, list actual nearby neighborhoods]
+    **Price Preference**: [budget/mid-range/luxury or specific range if mentioned]
+    **Property Type**: [apartment/duplex/studio/etc if mentioned, else "any"]
+    **Verified Context**: [what you learned from web research about these locations]
+    """
+    
+    understanding = await create_chat_completion(
+        model=CHAT_MODEL,
+        messages=[{"role": "user", "content": understanding_prompt}],
+        temperature=0.3,
+        max_tokens=500
+    )
+    
+    ai_understanding = understanding.choices[0].message.content
+    
+    # Step 3: Extract search parameters from AI understanding
+    understanding_lower = ai_understanding.lower()
+    
+    # Extract locations from AI response
+    search_locations = []
+    if "**search locations**:" in understanding_lower:
+        locations_line = ai_understanding.split("**Search Locations**:")[1].split("\n")[0]
+        search_locations = [loc.strip() for loc in locations_line.split(",")]
+    
+    # Add nearby areas if mentioned
+    if "**nearby areas**:" in understanding_lower:
+        nearby_line = ai_understanding.split("**Nearby Areas**:")[1].split("\n")[0]
+        nearby_locs = [loc.strip() for loc in nearby_line.split(",") if loc.strip() and "none" not in loc.lower()]
+        search_locations.extend(nearby_locs)
+    
+    if "budget" in understanding_lower or "affordable" in understanding_lower:
+        price_preference = "budget"
+    elif "luxury" in understanding_lower or "upscale" in understanding_lower:
+        price_preference = "luxury"
+    else:
+        price_preference = None
+    
+    return {
+        "web_research": {
+            "sources": [r['url'] for r in tavily_results.get('results', [])],
+            "context": web_context
+        },
+        "ai_understanding": ai_understanding,
+        "search_locations": search_locations,
+        "price_preference": price_preference
+    }
+
+def understand_search_query_locally(context: dict) -> dict:
+    """
+    Build the same understanding as understand_search_query from the geography
+    knowledge base alone, with a confidence score for whether that is enough
+    """
+    search_locations = []
+    nearby_areas = []
+    nearby_names = []
+    for neighborhood in context["neighborhoods"]:
+        search_locations.append(f"{neighborhood['name']}, {neighborhood['city']}")
+        if context["proximity_hints"]:
+            for nearby in geography.find_nearby_neighborhoods(neighborhood["name"], neighborhood["city"]):
+                nearby_areas.append(f"{nearby}, {neighborhood['city']}")
+                nearby_names.append(nearby)
+    covered_cities = {n["city"] for n in context["neighborhoods"]}
+    search_locations.extend(city for city in context["cities"] if city not in covered_cities)
+    
+    if context["neighborhoods"]:
+        confidence = 0.9
+    elif context["cities"]:
+        # "near <something>" inside a city we couldn't pin down needs the web
+        confidence = 0.5 if context["proximity_hints"] else 0.8
+    else:
+        confidence = 0.0
+    
+    if "budget-friendly" in context["preferences"]:
+        price_preference = "budget"
+    elif "upscale" in context["preferences"]:
+        price_preference = "luxury"
+    else:
+        price_preference = None
+    
+    known_for = [
+        f"{n['name']} ({n['city']}): {n['details'].get('known_for', '')}"
+        for n in context["neighborhoods"]
+    ]
+    ai_understanding = "\n".join([
+        f"**Search Locations**: {'; '.join(search_locations) or 'none'}",
+        f"**Nearby Areas**: {', '.join(nearby_names) or 'none'}",
+        f"**Price Preference**: {price_preference or 'any'}",
+        f"**Verified Context**: {'; '.join(known_for) or 'none'} (BODI knowledge base)"
+    ])
     
-    if not groq_client:
-        return {"error": "AI service unavailable"}
+    return {
+        "web_research": None,
+        "ai_understanding": ai_understanding,
+        "search_locations": search_locations + nearby_areas,
+        "price_preference": price_preference,
+        "confidence": confidence
+    }
+
+def find_semantic_matches(search_locations: list, price_preference: Optional[str]) -> list:
+    """
+    Filter by location (resolved through the location index) and price
+    preference, in catalogue order, limited to 10 results
+    """
+    candidates = None
+    if search_locations:
+        candidates = set()
+        for location in search_locations:
+            if location:
+                candidates |= db.location_ids(location)
+    price_filters = {}
+    if price_preference == "budget":
+        price_filters["max_price"] = BUDGET_MAX_PRICE
+    elif price_preference == "luxury":
+        price_filters["min_price"] = LUXURY_MIN_PRICE
+    filtered_properties, _ = db.query_properties(candidates=candidates, limit=10, **price_filters)
+    return filtered_properties
+
+@app.post("/api/search/semantic")
+async def semantic_search(query: str):
+    """
+    AI-powered semantic search with real-time internet access via Tavily
+    Verifies location claims and gathers contextual information before searching properties
     
+    Tiered: queries the geography knowledge base resolves confidently are answered
+    locally ("local"); otherwise a cached web+LLM understanding is reused ("cache"),
+    and only then are Tavily and Groq called ("web")
+    """
     try:
-        # Step 1: Use Tavily to research the location/context mentioned in query
-        search_query = f"Nigeria real estate {query} location information neighborhoods"
-        
-        tavily_results = tavily.search(
-            query=search_query,
-            search_depth="basic",
-            max_results=3
-        )
-        
-        # Extract web context
-        web_context = "\n".join([
-            f"- {result['title']}: {result['content'][:200]}..."
-            for result in tavily_results.get('results', [])
-        ])
-        
-        # Step 2: Use AI to understand query with web-verified context
-        understanding_prompt = f"""
-        You are a Nigerian real estate search assistant with access to the internet.
-        
-        User Query: "{query}"
-        
-        Web Research Results:
-        {web_context}
+        location_context = geography.get_location_context(query)
+        understanding = understand_search_query_locally(location_context)
+        local_confidence = understanding["confidence"]
+        tier = "local"
         
-        Based on the query and web research:
-        1. What specific locations/neighborhoods should I search? (Be specific about cities and areas)
-        2. If the user mentioned proximity (near/close to), what are the actual nearby neighborhoods?
-        3. What are the user's preferences? (price range, property type, amenities)
-        4. Are there any claims I should verify? (e.g., "close to university" - which university? which neighborhoods?)
+        if local_confidence < LOCAL_CONFIDENCE_THRESHOLD:
+            # Web research + LLM query understanding, cached per canonical query
+            cache_key = (geography.GEOGRAPHY_VERSION, geography.resolve_aliases(normalize_query(query)))
+            cached = understanding_cache.get(cache_key)
+            if cached is not None:
+                understanding, tier = cached, "cache"
+            else:
+                if not get_tavily_client():
+                    return {"error": "Tavily API key not configured"}
+                if not async_groq_client:
+                    return {"error": "AI service unavailable"}
+                understanding = await understand_search_query(query)
+                understanding_cache.set(cache_key, understanding)
+                tier = "web"
         
-        Respond in this exact format:
-        **Search Locations**: [comma-separated list of specific neighborhoods/cities]
-        **Nearby Areas**: [if proximity mentioned, list actual nearby neighborhoods]
-        **Price Preference**: [budget/mid-range/luxury or specific range if mentioned]
-        **Property Type**: [apartment/duplex/studio/etc if mentioned, else "any"]
-        **Verified Context**: [what you learned from web research about these locations]
-        """
+        ai_understanding = understanding["ai_understanding"]
+        search_locations = understanding["search_locations"]
         
-        understanding = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": understanding_prompt}],
-            temperature=0.3,
-            max_tokens=500
+        filtered_properties = await run_in_threadpool(
+            find_semantic_matches, search_locations, understanding["price_preference"]
         )
         
-        ai_understanding = understanding.choices[0].message.content
-        
-        # Step 3: Extract search parameters from AI understanding
-        understanding_lower = ai_understanding.lower()
-        
-        # Filter properties based on AI understanding
-        properties = list(db.properties.values())
-        filtered_properties = []
-        
-        # Extract locations from AI response
-        search_locations = []
-        if "**search locations**:" in understanding_lower:
-            locations_line = ai_understanding.split("**Search Locations**:")[1].split("\n")[0]
-            search_locations = [loc.strip() for loc in locations_line.split(",")]
-        
-        # Add nearby areas if mentioned
-        if "**nearby areas**:" in understanding_lower:
-            nearby_line = ai_understanding.split("**Nearby Areas**:")[1].split("\n")[0]
-            nearby_locs = [loc.strip() for loc in nearby_line.split(",") if loc.strip() and "none" not in loc.lower()]
-            search_locations.extend(nearby_locs)
-        
-        # Filter by location
-        if search_locations:
-            for prop in properties:
-                for location in search_locations:
-                    if location.lower() in prop.location.lower():
-                        if prop not in filtered_properties:
-                            filtered_properties.append(prop)
-        else:
-            filtered_properties = properties
-        
-        # Apply preference filters
-        if "budget" in understanding_lower or "affordable" in understanding_lower:
-            filtered_properties = [p for p in filtered_properties if p.price_ngn < 1000000]
-        elif "luxury" in understanding_lower or "upscale" in understanding_lower:
-            filtered_properties = [p for p in filtered_properties if p.price_ngn > 1500000]
-        
-        # Limit results
-        filtered_properties = filtered_properties[:10]
-        
         return {
             "query": query,
-            "web_research": {
-                "sources": [r['url'] for r in tavily_results.get('results', [])],
-                "context": web_context
-            },
+            "tier": tier,
+            "local_confidence": local_confidence,
+            "web_research": understanding["web_research"],
             "ai_understanding": ai_understanding,
+            "location_context": location_context,
             "search_locations": list(set([loc for loc in search_locations if loc])),
             "properties_found": len(filtered_properties),
             "properties": filtered_properties
@@ -295,6 +645,17 @@ async def semantic_search(query: str):
         print(f"Semantic search error: {e}")
         return {"error": str(e), "details": "Check server logs"}
 
+@app.get("/api/cache/stats")
+def get_cache_stats():
+    """Hit/miss counters for the in-process caches"""
+    return {
+        "web_search": web_search_cache.stats(),
+        "query_understanding": understanding_cache.stats(),
+        "json_fragments": db.json_fragments.stats(),
+        "property_queries": db.query_cache.stats(),
+        "idempotency_keys": db.idempotency.stats()
+    }
+
 # === USER & VERIFICATION ENDPOINTS ===
 @app.get("/api/users/{user_id}")
 def get_user(user_id: str):
@@ -312,6 +673,7 @@ def verify_user(user_id: str, verification: UserVerification):
     user = db.users[user_id]
     user.verification_level = verification.level
     user.trust_score += 100  # Reward for verification
+    db.save_user(user)
     
     return {
         "status": "success",
@@ -320,14 +682,19 @@ def verify_user(user_id: str, verification: UserVerification):
     }
 
 # === ESCROW ENDPOINTS ===
+# Create endpoints accept an Idempotency-Key header: retries with the same key
+# get the first response back instead of creating a duplicate (see idempotency.py)
 @app.post("/api/escrow/initiate")
-def initiate_escrow(request: EscrowInitiate):
+def initiate_escrow(request: EscrowInitiate, idempotency_key: Optional[str] = Header(None)):
     """Start escrow transaction"""
+    return db.idempotency.run("escrow", idempotency_key, request, lambda: _initiate_escrow(request))
+
+def _initiate_escrow(request: EscrowInitiate) -> dict:
     if request.property_id not in db.properties:
         raise HTTPException(status_code=404, detail="Property not found")
     
     property_data = db.properties[request.property_id]
-    transaction_id = f"ESC-{random.randint(10000, 99999)}"
+    transaction_id = new_id("ESC")
     
     escrow = EscrowTransaction(
         id=transaction_id,
@@ -338,11 +705,12 @@ def initiate_escrow(request: EscrowInitiate):
         status=EscrowStatus.PENDING
     )
     
-    db.escrow_transactions[transaction_id] = escrow
+    db.add_escrow(escrow)
     
     return {
         "status": "success",
         "transaction_id": transaction_id,
+        "version": escrow.version,
         "message": f"Escrow initiated: ₦{request.amount_ngn:,}. Funds will be held securely.",
         "next_steps": "Complete payment to move status to 'DEPOSITED'"
     }
@@ -354,23 +722,35 @@ def get_escrow_status(transaction_id: str):
         raise HTTPException(status_code=404, detail="Transaction not found")
     return db.escrow_transactions[transaction_id]
 
-@app.post("/api/escrow/{transaction_id}/release")
-def release_escrow(transaction_id: str):
-    """Release funds (tenant confirms move-in)"""
+def _transition_escrow(transaction_id: str, status: EscrowStatus, expected_version: Optional[int]) -> EscrowTransaction:
+    """Apply a status change, mapping state machine and version conflicts to 409"""
     if transaction_id not in db.escrow_transactions:
         raise HTTPException(status_code=404, detail="Transaction not found")
-    
-    escrow = db.escrow_transactions[transaction_id]
-    escrow.status = EscrowStatus.RELEASED
-    escrow.completed_at = datetime.now()
-    
-    return {"status": "success", "message": "Funds released to landlord"}
+    try:
+        return db.transition_escrow(transaction_id, status, expected_version)
+    except EscrowConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/api/escrow/{transaction_id}/deposit")
+def confirm_escrow_deposit(transaction_id: str, expected_version: Optional[int] = None):
+    """Mark the tenant's payment as received"""
+    escrow = _transition_escrow(transaction_id, EscrowStatus.DEPOSITED, expected_version)
+    return {"status": "success", "version": escrow.version, "message": "Payment received. Funds are held in escrow."}
+
+@app.post("/api/escrow/{transaction_id}/release")
+def release_escrow(transaction_id: str, expected_version: Optional[int] = None):
+    """Release funds (tenant confirms move-in)"""
+    escrow = _transition_escrow(transaction_id, EscrowStatus.RELEASED, expected_version)
+    return {"status": "success", "version": escrow.version, "message": "Funds released to landlord"}
 
 # === REVIEW ENDPOINTS ===
 @app.post("/api/reviews")
-def create_review(review: ReviewCreate):
+def create_review(review: ReviewCreate, idempotency_key: Optional[str] = Header(None)):
     """Submit property review"""
-    review_id = f"REV-{random.randint(100, 999)}"
+    return db.idempotency.run("review", idempotency_key, review, lambda: _create_review(review))
+
+def _create_review(review: ReviewCreate) -> dict:
+    review_id = new_id("REV")
     new_review = Review(
         id=review_id,
         property_id=review.property_id,
@@ -378,22 +758,29 @@ def create_review(review: ReviewCreate):
         rating=review.rating,
         comment=review.comment
     )
-    db.reviews[review_id] = new_review
+    db.add_review(new_review)
     
     return {"status": "success", "review_id": review_id, "message": "Review posted!"}
 
 @app.get("/api/reviews/property/{property_id}")
-def get_property_reviews(property_id: str):
+def get_property_reviews(property_id: str, request: Request):
     """Get all reviews for a property"""
-    reviews = [r for r in db.reviews.values() if r.property_id == property_id]
-    avg_rating = sum(r.rating for r in reviews) / len(reviews) if reviews else 0
-    return {"reviews": reviews, "average_rating": avg_rating, "total_reviews": len(reviews)}
+    tag, modified = db.change_stamp(f"reviews:{property_id}")
+    if is_not_modified(request, tag, modified):
+        return not_modified_response(tag, modified)
+    
+    stats = db.get_review_stats(property_id)
+    return RawJSONResponse(extend_object(
+        b"{}",
+        {"average_rating": stats.average, "total_reviews": stats.count, "rating_histogram": stats.to_dict()["histogram"]},
+        raw={"reviews": db.json_fragments.array(db.get_property_reviews(property_id))}
+    ), headers=cache_headers(tag, modified))
 
 # === SAFETY ENDPOINTS ===
 @app.post("/api/safety/location-share")
 def start_location_share(location: LocationShare):
     """Start live location sharing (for property viewings)"""
-    share_id = f"LOC-{random.randint(1000, 9999)}"
+    share_id = new_id("LOC")
     location.created_at = datetime.now()
     db.location_shares[share_id] = location
     
@@ -418,21 +805,17 @@ def trigger_emergency(alert: EmergencyTrigger):
 @app.get("/api/service-providers")
 def get_service_providers(service_type: Optional[str] = None, area: Optional[str] = None):
     """Get verified service providers"""
-    providers = list(db.service_providers.values())
-    
-    if service_type:
-        providers = [p for p in providers if p.service_type == service_type]
-    if area:
-        providers = [p for p in providers if any(area.lower() in sa.lower() for sa in p.service_area)]
-    
-    return providers
+    return db.get_service_providers(service_type=service_type, area=area)
 
 @app.post("/api/maintenance")
-def create_maintenance_request(request: MaintenanceRequest):
+def create_maintenance_request(request: MaintenanceRequest, idempotency_key: Optional[str] = Header(None)):
     """Tenant submits maintenance request"""
-    request_id = f"MAINT-{random.randint(100, 999)}"
+    return db.idempotency.run("maintenance", idempotency_key, request, lambda: _create_maintenance_request(request))
+
+def _create_maintenance_request(request: MaintenanceRequest) -> dict:
+    request_id = new_id("MAINT")
     request.id = request_id
-    db.maintenance_requests[request_id] = request
+    db.add_maintenance_request(request)
     
     return {
         "status": "success",
@@ -442,9 +825,12 @@ def create_maintenance_request(request: MaintenanceRequest):
 
 # === LANDLORD/DEVELOPER ENDPOINTS ===
 @app.post("/api/landlord/properties")
-def create_property(property_data: Property):
+def create_property(property_data: Property, idempotency_key: Optional[str] = Header(None)):
     """Landlord lists a new property"""
-    db.properties[property_data.id] = property_data
+    return db.idempotency.run("property", idempotency_key, property_data, lambda: _create_property(property_data))
+
+def _create_property(property_data: Property) -> dict:
+    db.add_property(property_data)
     return {
         "property_id": property_data.id,
         "message": "Property listed successfully!",
@@ -454,8 +840,7 @@ def create_property(property_data: Property):
 @app.get("/api/landlord/{landlord_id}/properties")
 def get_landlord_properties(landlord_id: str):
     """Get all properties owned by a landlord"""
-    properties = [p for p in db.properties.values() if p.owner_id == landlord_id]
-    return properties
+    return db.get_owner_properties(landlord_id)
 
 @app.put("/api/landlord/properties/{property_id}")
 def update_property(property_id: str, updates: dict):
@@ -463,10 +848,10 @@ def update_property(property_id: str, updates: dict):
     if property_id not in db.properties:
         raise HTTPException(status_code=404, detail="Property not found")
     
-    property = db.properties[property_id]
-    for key, value in updates.items():
-        if hasattr(property, key):
-            setattr(property, key, value)
+    try:
+        property = db.update_property(property_id, updates)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors())
     
     return {"message": "Property updated successfully", "property": property}
 
@@ -476,50 +861,35 @@ def delete_property(property_id: str):
     if property_id not in db.properties:
         raise HTTPException(status_code=404, detail="Property not found")
     
-    del db.properties[property_id]
+    db.remove_property(property_id)
     return {"message": "Property listing removed"}
 
 @app.get("/api/landlord/{landlord_id}/escrow-transactions")
-def get_landlord_escrow(landlord_id: str):
-    """Get all escrow transactions for landlord's properties"""
-    landlord_properties = [p.id for p in db.properties.values() if p.owner_id == landlord_id]
-    transactions = [
-        t for t in db.escrow_transactions.values() 
-        if t.property_id in landlord_properties
-    ]
-    return transactions
+def get_landlord_escrow(landlord_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None):
+    """Get escrow transactions for landlord's properties, optionally created in [since, until)"""
+    escrows = db.get_owner_escrows(landlord_id)
+    if since or until:
+        # Transaction IDs sort by creation time, so the range is two string comparisons
+        low, high = id_range("ESC", since or datetime.fromtimestamp(0), until or datetime.max.replace(year=9000))
+        escrows = [e for e in escrows if low <= e.id < high]
+    return escrows
 
 @app.get("/api/landlord/{landlord_id}/maintenance-requests")
 def get_landlord_maintenance(landlord_id: str):
     """Get all maintenance requests for landlord's properties"""
-    landlord_properties = [p.id for p in db.properties.values() if p.owner_id == landlord_id]
-    requests = [
-        r for r in db.maintenance_requests.values()
-        if r.property_id in landlord_properties
-    ]
-    return requests
+    return db.get_owner_maintenance_requests(landlord_id)
 
 @app.get("/api/landlord/{landlord_id}/analytics")
 def get_landlord_analytics(landlord_id: str):
-    """Get dashboard analytics for landlord"""
-    properties = [p for p in db.properties.values() if p.owner_id == landlord_id]
-    landlord_property_ids = [p.id for p in properties]
-    
-    escrow_transactions = [
-        t for t in db.escrow_transactions.values()
-        if t.property_id in landlord_property_ids
-    ]
-    
-    total_revenue = sum(t.amount_ngn for t in escrow_transactions if t.status == EscrowStatus.RELEASED)
-    pending_revenue = sum(t.amount_ngn for t in escrow_transactions if t.status == EscrowStatus.DEPOSITED)
-    
+    """Get dashboard analytics for landlord (maintained incrementally on every write)"""
+    return db.get_landlord_rollup(landlord_id).to_dict()
+
+@app.get("/api/landlord/{landlord_id}/revenue")
+def get_landlord_revenue(landlord_id: str, granularity: str = Query("monthly", pattern="^(daily|monthly)$")):
+    """Released revenue and escrow volume per day or month"""
     return {
-        "total_properties": len(properties),
-        "verified_properties": len([p for p in properties if p.verified]),
-        "total_revenue": total_revenue,
-        "pending_revenue": pending_revenue,
-        "active_escrows": len([t for t in escrow_transactions if t.status in [EscrowStatus.PENDING, EscrowStatus.DEPOSITED]]),
-        "average_safety_score": round(sum(p.safety_score for p in properties) / len(properties), 1) if properties else 0
+        "granularity": granularity,
+        "series": db.get_landlord_rollup(landlord_id).series(granularity)
     }
 
 if __name__ == "__main__":
@@ -19,6 +19,16 @@ class EscrowStatus(str, Enum):
     DISPUTED = "disputed"
     REFUNDED = "refunded"
 
+# Allowed escrow status changes; released and refunded escrows are final
+ESCROW_TRANSITIONS = {
+    EscrowStatus.PENDING: {EscrowStatus.DEPOSITED, EscrowStatus.REFUNDED},
+    EscrowStatus.DEPOSITED: {EscrowStatus.HELD, EscrowStatus.RELEASED, EscrowStatus.DISPUTED, EscrowStatus.REFUNDED},
+    EscrowStatus.HELD: {EscrowStatus.RELEASED, EscrowStatus.DISPUTED, EscrowStatus.REFUNDED},
+    EscrowStatus.DISPUTED: {EscrowStatus.RELEASED, EscrowStatus.REFUNDED},
+    EscrowStatus.RELEASED: set(),
+    EscrowStatus.REFUNDED: set(),
+}
+
 class PropertyType(str, Enum):
     APARTMENT = "apartment"
     DUPLEX = "duplex"
@@ -58,6 +68,9 @@ class Property(BaseModel):
     image_urls: List[str]
     amenities: List[str] = []
     neighborhood_id: Optional[str] = None
+    bedrooms: Optional[int] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
 
 class PropertyDetail(Property):
     virtual_tour_url: Optional[str] = None
@@ -75,6 +88,7 @@ class EscrowTransaction(BaseModel):
     created_at: datetime = Field(default_factory=datetime.now)
     completed_at: Optional[datetime] = None
     dispute_reason: Optional[str] = None
+    version: int = 0  # bumped on every status change
 
 class EscrowInitiate(BaseModel):
     property_id: str
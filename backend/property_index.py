@@ -0,0 +1,333 @@
+"""
+In-memory query engine for property listings
+Keeps ID sets and sorted indexes so filtered, sorted and paginated
+listing queries only touch the rows they return
+"""
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+import base64
+import bisect
+import heapq
+import json
+import math
+from models import Property
+from geography import canonical_location_name, neighborhood_key, neighborhood_place
+
+# Public sort names -> indexed field
+SORT_FIELDS = {
+    "price": "price_ngn",
+    "safety_score": "safety_score",
+}
+
+# Default ordering is catalogue (insertion) order
+DEFAULT_ORDER = "seq"
+
+class InvalidCursor(ValueError):
+    pass
+
+def parse_location(prop: Property) -> Tuple[str, Optional[str], Optional[str]]:
+    """Split a listing's "Neighborhood, City" location into (city, neighborhood, neighborhood_id)"""
+    parts = [part.strip() for part in prop.location.split(",") if part.strip()]
+    city = parts[-1] if parts else ""
+    neighborhood = parts[0] if len(parts) > 1 else None
+    neighborhood_id = prop.neighborhood_id or (neighborhood_key(city, neighborhood) if neighborhood else None)
+    return city, neighborhood, neighborhood_id
+
+def encode_cursor(sort: str, key: tuple) -> str:
+    raw = json.dumps({"s": sort, "k": list(key)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort: str) -> tuple:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        key = tuple(data["k"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(f"Malformed cursor: {e}")
+    if data.get("s") != sort or len(key) != 2:
+        raise InvalidCursor("Cursor does not match the requested sort order")
+    # Keys are compared against indexed values, so the types must match too
+    value, property_id = key
+    value_types = (int, float) if sort else (int,)
+    if isinstance(value, bool) or not isinstance(value, value_types) or not math.isfinite(value) or not isinstance(property_id, str):
+        raise InvalidCursor("Malformed cursor: unexpected key types")
+    return key
+
+class PropertyIndex:
+    def __init__(self):
+        self.verified: Set[str] = set()
+        self.by_type: Dict[str, Set[str]] = {}
+        self.by_amenity: Dict[str, Set[str]] = {}
+        self.by_bedrooms: Dict[int, Set[str]] = {}
+
+        # Location hierarchy: city -> neighborhood_id -> property IDs.
+        # Names are stored lowercased; neighborhood names can be shared
+        # across cities (e.g. "GRA" in Port Harcourt and Enugu)
+        self.by_city: Dict[str, Set[str]] = {}
+        self.by_neighborhood: Dict[str, Set[str]] = {}
+        self.city_neighborhoods: Dict[str, Set[str]] = {}
+        self.neighborhood_ids: Dict[str, Set[str]] = {}
+        self.places: Dict[str, Tuple[str, str]] = {}  # neighborhood_id -> (city, neighborhood)
+
+        # Sorted (value, property_id) lists, one per orderable field
+        self.sorted: Dict[str, List[tuple]] = {DEFAULT_ORDER: [], "price_ngn": [], "safety_score": []}
+
+        # Snapshot of the indexed values per property, so entries can be
+        # removed after the live model has been mutated in place
+        self._entries: Dict[str, dict] = {}
+        self._seq = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, prop: Property):
+        """Index a property (re-adding an indexed ID keeps its catalogue position)"""
+        previous = self._entries.get(prop.id)
+        if previous is not None:
+            self.remove(prop.id)
+            seq = previous["seq"]
+        else:
+            self._seq += 1
+            seq = self._seq
+
+        entry = {
+            "seq": seq,
+            "price_ngn": prop.price_ngn,
+            "safety_score": prop.safety_score,
+            "verified": prop.verified,
+            "type": prop.type.value,
+            "amenities": {a.lower() for a in prop.amenities},
+            "bedrooms": prop.bedrooms,
+        }
+        city, neighborhood, neighborhood_id = parse_location(prop)
+        entry["city"] = city.lower()
+        entry["neighborhood_id"] = neighborhood_id
+        self._entries[prop.id] = entry
+
+        if entry["verified"]:
+            self.verified.add(prop.id)
+        self.by_type.setdefault(entry["type"], set()).add(prop.id)
+        for amenity in entry["amenities"]:
+            self.by_amenity.setdefault(amenity, set()).add(prop.id)
+        if entry["bedrooms"] is not None:
+            self.by_bedrooms.setdefault(entry["bedrooms"], set()).add(prop.id)
+        self.by_city.setdefault(entry["city"], set()).add(prop.id)
+        if neighborhood_id:
+            if neighborhood_id not in self.by_neighborhood:
+                # Knowledge-base IDs always keep their own place, whatever the
+                # listing that happens to register them says
+                place = neighborhood_place(neighborhood_id)
+                name, place_city = place if place else ((neighborhood or neighborhood_id).lower(), entry["city"])
+                self.places[neighborhood_id] = (place_city, name)
+                self.city_neighborhoods.setdefault(place_city, set()).add(neighborhood_id)
+                self.neighborhood_ids.setdefault(name, set()).add(neighborhood_id)
+            self.by_neighborhood.setdefault(neighborhood_id, set()).add(prop.id)
+        for field, order in self.sorted.items():
+            bisect.insort(order, (entry[field], prop.id))
+
+    def remove(self, property_id: str):
+        entry = self._entries.pop(property_id, None)
+        if entry is None:
+            return
+
+        self.verified.discard(property_id)
+        _discard(self.by_type, entry["type"], property_id)
+        for amenity in entry["amenities"]:
+            _discard(self.by_amenity, amenity, property_id)
+        if entry["bedrooms"] is not None:
+            _discard(self.by_bedrooms, entry["bedrooms"], property_id)
+        _discard(self.by_city, entry["city"], property_id)
+        neighborhood_id = entry["neighborhood_id"]
+        if neighborhood_id:
+            _discard(self.by_neighborhood, neighborhood_id, property_id)
+            if neighborhood_id not in self.by_neighborhood:
+                city, name = self.places.pop(neighborhood_id)
+                _discard(self.city_neighborhoods, city, neighborhood_id)
+                _discard(self.neighborhood_ids, name, neighborhood_id)
+        for field, order in self.sorted.items():
+            key = (entry[field], property_id)
+            pos = bisect.bisect_left(order, key)
+            if pos < len(order) and order[pos] == key:
+                del order[pos]
+
+    def seq(self, property_id: str) -> int:
+        """Catalogue position of an indexed property"""
+        return self._entries[property_id]["seq"]
+
+    def estimate_fraction(
+        self,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        verified_only: bool = False,
+        types: Optional[Iterable[str]] = None,
+        amenities: Optional[Iterable[str]] = None,
+        min_bedrooms: Optional[int] = None,
+        candidates: Optional[Set[str]] = None,
+        **_,
+    ) -> float:
+        """Estimated share of listings matching the filters (assuming they are independent)"""
+        total = len(self._entries)
+        if not total:
+            return 0.0
+        counts = []
+        if candidates is not None:
+            counts.append(len(candidates))
+        if verified_only:
+            counts.append(len(self.verified))
+        if types:
+            counts.append(sum(len(self.by_type.get(t, ())) for t in types))
+        for amenity in amenities or ():
+            counts.append(len(self.by_amenity.get(amenity.lower(), ())))
+        if min_bedrooms is not None:
+            counts.append(sum(len(ids) for n, ids in self.by_bedrooms.items() if n >= min_bedrooms))
+        if min_price is not None or max_price is not None:
+            order = self.sorted["price_ngn"]
+            lo = bisect.bisect_left(order, (min_price,)) if min_price is not None else 0
+            hi = bisect.bisect_left(order, (max_price, chr(0x10FFFF))) if max_price is not None else total
+            counts.append(max(hi - lo, 0))
+        fraction = 1.0
+        for count in counts:
+            fraction *= count / total
+        return fraction
+
+    def resolve_neighborhoods(self, location: str) -> Tuple[Set[str], Set[str]]:
+        """
+        Resolve a location string to (cities, neighborhood_ids) with dictionary lookups
+        Accepts a city ("Lagos"), a neighborhood ("Yaba", "VI"), a qualified
+        neighborhood ("GRA, Enugu") or a neighborhood_id ("POR-GRA")
+        """
+        parts = [canonical_location_name(part).lower() for part in location.split(",") if part.strip()]
+        if not parts:
+            return set(), set()
+
+        if len(parts) > 1:
+            name, city = parts[0], parts[-1]
+            return set(), {nid for nid in self.neighborhood_ids.get(name, ()) if self.places[nid][0] == city}
+
+        key = parts[0]
+        if key.upper() in self.places:
+            return set(), {key.upper()}
+        if key in self.by_city:
+            return {key}, set()
+        return set(), set(self.neighborhood_ids.get(key, ()))
+
+    def location_ids(self, location: str) -> Set[str]:
+        """Property IDs located in the given place (empty if unknown)"""
+        cities, neighborhood_ids = self.resolve_neighborhoods(location)
+        groups = [self.by_city[c] for c in cities] + [self.by_neighborhood[n] for n in neighborhood_ids]
+        if len(groups) == 1:
+            return set(groups[0])  # a copy: callers may keep or extend it
+        return _union(groups)
+
+    def query(
+        self,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        verified_only: bool = False,
+        types: Optional[Iterable[str]] = None,
+        amenities: Optional[Iterable[str]] = None,
+        min_bedrooms: Optional[int] = None,
+        candidates: Optional[Set[str]] = None,
+        predicate: Optional[Callable[[str], bool]] = None,
+        sort: Optional[str] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[str], Optional[str]]:
+        """
+        Return (property_ids, next_cursor) for the given filters
+        sort is one of None, "price", "-price", "safety_score", "-safety_score"
+        candidates is an optional pre-computed ID set (e.g. from a location index)
+        """
+        sort_name = sort or ""
+        descending = sort_name.startswith("-")
+        if sort_name and sort_name.lstrip("-") not in SORT_FIELDS:
+            raise ValueError(f"Unsupported sort: {sort}")
+        field = SORT_FIELDS[sort_name.lstrip("-")] if sort_name else DEFAULT_ORDER
+        after = decode_cursor(cursor, sort_name) if cursor else None
+
+        # 1. Intersect ID sets, smallest first
+        sets = [] if candidates is None else [candidates]
+        if verified_only:
+            sets.append(self.verified)
+        if types:
+            sets.append(_union(self.by_type.get(t, set()) for t in types))
+        for amenity in amenities or ():
+            sets.append(self.by_amenity.get(amenity.lower(), set()))
+        if min_bedrooms is not None:
+            sets.append(_union(ids for n, ids in self.by_bedrooms.items() if n >= min_bedrooms))
+
+        sets.sort(key=len)
+
+        def accept(pid: str) -> bool:
+            price = self._entries[pid]["price_ngn"]
+            if min_price is not None and price < min_price:
+                return False
+            if max_price is not None and price > max_price:
+                return False
+            return predicate is None or predicate(pid)
+
+        # 2. Bound the walk by the cursor and, when sorting by price, the price range
+        order = self.sorted[field]
+        lo, hi = 0, len(order)
+        if field == "price_ngn":
+            if min_price is not None:
+                lo = bisect.bisect_left(order, (min_price,))
+            if max_price is not None:
+                hi = bisect.bisect_left(order, (max_price, chr(0x10FFFF)))
+        if after is not None:
+            if descending:
+                hi = min(hi, bisect.bisect_left(order, after))
+            else:
+                lo = max(lo, bisect.bisect_right(order, after))
+
+        want = None if limit is None else limit + 1
+
+        # 3a. Few candidates: intersect and rank them directly instead of walking the index
+        if sets and len(sets[0]) < max(hi - lo, 1) // 8:
+            matched = sets[0].intersection(*sets[1:])
+            keyed = []
+            for pid in matched:
+                key = (self._entries[pid][field], pid)
+                if after is not None and (key >= after if descending else key <= after):
+                    continue
+                if accept(pid):
+                    keyed.append(key)
+            if want is None:
+                keyed.sort(reverse=descending)
+            elif descending:
+                keyed = heapq.nlargest(want, keyed)
+            else:
+                keyed = heapq.nsmallest(want, keyed)
+        # 3b. Otherwise walk the sorted index, probing the sets (most selective
+        # first) without materializing their intersection, and stop once the page is full
+        else:
+            keyed = []
+            span = range(hi - 1, lo - 1, -1) if descending else range(lo, hi)
+            for i in span:
+                key = order[i]
+                pid = key[1]
+                if sets and not all(pid in ids for ids in sets):
+                    continue
+                if not accept(pid):
+                    continue
+                keyed.append(key)
+                if want is not None and len(keyed) >= want:
+                    break
+
+        next_cursor = None
+        if limit is not None and len(keyed) > limit:
+            keyed = keyed[:limit]
+            next_cursor = encode_cursor(sort_name, keyed[-1])
+        return [pid for _, pid in keyed], next_cursor
+
+def _discard(index: Dict, key, property_id: str):
+    bucket = index.get(key)
+    if bucket is not None:
+        bucket.discard(property_id)
+        if not bucket:
+            del index[key]
+
+def _union(groups: Iterable[Set[str]]) -> Set[str]:
+    result: Set[str] = set()
+    for ids in groups:
+        result |= ids
+    return result
@@ -0,0 +1,117 @@
+"""
+Listing retrieval for the chat assistant
+Picks the few listings relevant to the conversation so the system prompt
+stays the same size no matter how many listings we host
+"""
+from typing import List, Optional
+import re
+from models import Property, PropertyType
+from database import db
+from geography import get_location_context, find_nearby_neighborhoods
+
+# How many listings go into the prompt, and how many filtered matches get re-ranked
+CHAT_TOP_K = 8
+RETRIEVAL_POOL = 50
+
+# Budget/luxury intent thresholds (shared with semantic search)
+BUDGET_MAX_PRICE = 1000000
+LUXURY_MIN_PRICE = 1500000
+
+PRICE_PATTERN = re.compile(
+    r"(under|below|less than|max(?:imum)?|up to|within|not more than|above|over|more than|at least|min(?:imum)?|from)?"
+    r"\s*(?:₦|ngn|n)?\s*(\d[\d,]*(?:\.\d+)?)\s*(k|m|million|mil|thousand)?\b"
+)
+MAX_WORDS = {"under", "below", "less than", "max", "maximum", "up to", "within", "not more than"}
+MIN_WORDS = {"above", "over", "more than", "at least", "min", "minimum", "from"}
+MULTIPLIERS = {"k": 1000, "thousand": 1000, "m": 1000000, "mil": 1000000, "million": 1000000}
+
+TYPE_PATTERNS = [
+    (PropertyType.STUDIO, re.compile(r"\bstudios?\b")),
+    (PropertyType.DUPLEX, re.compile(r"\bduplex(?:es)?\b")),
+    (PropertyType.BUNGALOW, re.compile(r"\bbungalows?\b")),
+    (PropertyType.APARTMENT, re.compile(r"\bapartments?\b")),
+    (PropertyType.FLAT, re.compile(r"\b(?:flats?|self[- ]?contain(?:ed)?)\b")),
+]
+
+def extract_price_range(text: str) -> tuple:
+    """Pull (min_price, max_price) out of phrases like "under 800k" or "above ₦1.5m" """
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    for direction, number, suffix in PRICE_PATTERN.findall(text.lower()):
+        amount = float(number.replace(",", "")) * MULTIPLIERS.get(suffix, 1)
+        if amount < 10000:
+            continue  # bedroom counts, years, etc.
+        if direction in MIN_WORDS:
+            min_price = amount
+        else:
+            max_price = amount
+    return min_price, max_price
+
+def extract_listing_filters(text: str) -> dict:
+    """Local (no LLM) extraction of location, price and type filters for PropertyIndex.query"""
+    text_lower = text.lower()
+    filters = {}
+
+    context = get_location_context(text)
+    wants_nearby = bool(context["proximity_hints"])
+    location_ids = set()
+    resolved_cities = set()
+    for neighborhood in context["neighborhoods"]:
+        name, city = neighborhood["name"], neighborhood["city"]
+        resolved_cities.add(city)
+        location_ids |= db.location_ids(f"{name}, {city}")
+        if wants_nearby:
+            for nearby in find_nearby_neighborhoods(name, city):
+                location_ids |= db.location_ids(f"{nearby}, {city}")
+    for city in context["cities"]:
+        if city not in resolved_cities:
+            location_ids |= db.location_ids(city)
+    # Cities with listings that the geography knowledge base doesn't cover yet
+    known_cities = {city.lower() for city in resolved_cities | set(context["cities"])}
+    for city in db.listing_cities():
+        if city and city not in known_cities and re.search(rf"\b{re.escape(city)}\b", text_lower):
+            location_ids |= db.location_ids(city)
+    if context["neighborhoods"] or context["cities"] or location_ids:
+        filters["candidates"] = location_ids
+
+    min_price, max_price = extract_price_range(text)
+    if "budget-friendly" in context["preferences"] and max_price is None:
+        max_price = BUDGET_MAX_PRICE
+    if "upscale" in context["preferences"] and min_price is None:
+        min_price = LUXURY_MIN_PRICE
+    if min_price is not None:
+        filters["min_price"] = min_price
+    if max_price is not None:
+        filters["max_price"] = max_price
+
+    types = [t.value for t, pattern in TYPE_PATTERNS if pattern.search(text_lower)]
+    if types:
+        filters["types"] = types
+    return filters
+
+def retrieve_listings(text: str, k: int = CHAT_TOP_K) -> List[Property]:
+    """
+    Top-k listings for a conversation snippet
+    Structured filters narrow the pool (safest first), BM25 re-ranks it. If nothing
+    matches, price and then type filters are relaxed so the assistant can offer the
+    closest alternatives; with no usable filters we fall back to keyword search,
+    then to the safest verified listings
+    """
+    results: List[Property] = []
+    filters = extract_listing_filters(text)
+    relaxations = [(), ("min_price", "max_price"), ("min_price", "max_price", "types")]
+    for dropped in relaxations:
+        attempt = {key: value for key, value in filters.items() if key not in dropped}
+        if not attempt or (dropped and attempt == filters):
+            continue
+        pool, _ = db.query_properties(**attempt, sort="-safety_score", limit=RETRIEVAL_POOL)
+        if pool:
+            scores = db.text_scores(text, [p.id for p in pool])
+            pool.sort(key=lambda p: scores.get(p.id, 0), reverse=True)
+            results = pool[:k]
+            break
+    if not results:
+        results = [p for p, _ in db.search_properties(text, limit=k)]
+    if not results:
+        results, _ = db.query_properties(verified_only=True, sort="-safety_score", limit=k)
+    return results
@@ -0,0 +1,134 @@
+"""
+Full-text inverted index for property listings
+Ranks listings against keyword queries with BM25, entirely in-process
+"""
+from typing import Dict, List, Tuple
+import heapq
+import math
+import re
+from models import Property
+
+# "2-bedroom", "2 bedrooms" and "2 bed" all fold to the single token "2-bedroom",
+# so bedroom counts don't collide with other numbers such as "Wuse 2"
+BEDROOM_PATTERN = re.compile(r"\b(\d+)\s*-?\s*(?:bedroom|bed|br)s?\b")
+TOKEN_PATTERN = re.compile(r"\d+-bedroom|[a-z0-9]+(?:/[0-9]+)?")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "at", "for", "from", "in", "is", "of", "on",
+    "or", "the", "to", "with", "i", "me", "my", "want", "need", "looking",
+    "find", "any", "some", "very", "area",
+}
+
+# Field weights: a term in the title counts more than one in the description
+FIELD_WEIGHTS = {
+    "title": 2,
+    "location": 2,
+    "amenities": 1,
+    "description": 1,
+}
+
+def _stem(token: str) -> str:
+    """Very light plural folding ("bedrooms" -> "bedroom", "estates" -> "estate")"""
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+def tokenize(text: str) -> List[str]:
+    text = BEDROOM_PATTERN.sub(r"\1-bedroom", text.lower())
+    return [_stem(t) for t in TOKEN_PATTERN.findall(text) if t not in STOPWORDS]
+
+class TextIndex:
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}  # term -> {property_id: weighted tf}
+        self.doc_lengths: Dict[str, int] = {}
+        self._doc_terms: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def _document_terms(self, prop: Property) -> Dict[str, int]:
+        fields = {
+            "title": prop.title,
+            "location": prop.location,
+            "amenities": " ".join(prop.amenities),
+            "description": prop.description,
+        }
+        terms: Dict[str, int] = {}
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS[field]
+            for token in tokenize(text):
+                terms[token] = terms.get(token, 0) + weight
+        return terms
+
+    def add(self, prop: Property):
+        """Index (or re-index) a listing"""
+        self.remove(prop.id)
+        terms = self._document_terms(prop)
+        length = sum(terms.values())
+        self._doc_terms[prop.id] = terms
+        self.doc_lengths[prop.id] = length
+        self._total_length += length
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[prop.id] = tf
+
+    def remove(self, property_id: str):
+        terms = self._doc_terms.pop(property_id, None)
+        if terms is None:
+            return
+        self._total_length -= self.doc_lengths.pop(property_id)
+        for term in terms:
+            docs = self.postings[term]
+            del docs[property_id]
+            if not docs:
+                del self.postings[term]
+
+    def score(self, query: str, property_ids: List[str]) -> Dict[str, float]:
+        """BM25 scores for a given set of listings only (cost scales with the set, not the index)"""
+        n_docs = len(self.doc_lengths)
+        if not n_docs:
+            return {}
+        avg_length = self._total_length / n_docs
+
+        terms = []
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if docs:
+                terms.append((term, math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))))
+
+        scores: Dict[str, float] = {}
+        for pid in property_ids:
+            doc_terms = self._doc_terms.get(pid)
+            if not doc_terms:
+                continue
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[pid] / avg_length)
+            total = 0.0
+            for term, idf in terms:
+                tf = doc_terms.get(term)
+                if tf:
+                    total += idf * tf * (self.k1 + 1) / (tf + norm)
+            if total:
+                scores[pid] = round(total, 4)
+        return scores
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """Return the top `limit` (property_id, score) pairs for a keyword query"""
+        n_docs = len(self.doc_lengths)
+        if not n_docs:
+            return []
+        avg_length = self._total_length / n_docs
+
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for pid, tf in docs.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[pid] / avg_length)
+                scores[pid] = scores.get(pid, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        top = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+        return [(pid, round(score, 4)) for pid, score in top]
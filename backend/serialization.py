@@ -0,0 +1,105 @@
+"""
+Fast JSON output for BODI
+orjson-backed encoding (stdlib json as a fallback), a cache of pre-serialized
+records, and helpers that assemble response bodies from cached fragments so hot
+listing endpoints skip per-request validation and re-encoding
+"""
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Dict, Iterable, Optional, Tuple
+import json
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:
+    print("Warning: orjson not installed, falling back to the standard json module")
+    orjson = None
+
+def _default(value):
+    if hasattr(value, "dict"):
+        return value.dict()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+def loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+class RawJSONResponse(Response):
+    """A response whose body is already-encoded JSON"""
+    media_type = "application/json"
+
+def json_array(fragments: Iterable[bytes]) -> bytes:
+    return b"[" + b",".join(fragments) + b"]"
+
+def extend_object(fragment: bytes, fields: Optional[dict] = None, raw: Optional[Dict[str, bytes]] = None) -> bytes:
+    """Append fields (encoded here) and raw fields (already-encoded JSON) to an encoded object"""
+    parts = []
+    if fields:
+        parts.append(dumps(fields)[1:-1])
+    for name, value in (raw or {}).items():
+        parts.append(dumps(name) + b":" + value)
+    if not parts:
+        return fragment
+    separator = b"," if fragment != b"{}" else b""
+    return fragment[:-1] + separator + b",".join(parts) + b"}"
+
+class FragmentCache:
+    """
+    Encoded JSON per record, keyed by (model, id)
+    An entry is reused only while the stored record is the very object passed in,
+    so records replaced on write are re-encoded automatically
+    """
+
+    def __init__(self):
+        self._entries: Dict[Tuple[str, str], Tuple[Any, bytes]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, record) -> bytes:
+        key = (type(record).__name__, record.id)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is record:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        data = dumps(record.dict())
+        self._entries[key] = (record, data)
+        return data
+
+    def array(self, records: Iterable) -> bytes:
+        return json_array(self.get(record) for record in records)
+
+    def invalidate(self, model_name: str, record_id: str):
+        self._entries.pop((model_name, record_id), None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "name": "json_fragments",
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
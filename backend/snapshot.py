@@ -0,0 +1,145 @@
+"""
+Dataset snapshot for fast, identical worker startup
+The seed dataset is generated once from a fixed seed and written as compact JSON
+rows per table. Workers load the snapshot instead of regenerating and
+re-validating every model, so they all serve the same catalogue. A snapshot is
+only used if it was built from the same seed, geography, generator code and
+model fields
+"""
+from datetime import datetime
+from enum import Enum
+from types import CodeType
+from typing import Callable, Dict, Iterable, Optional, Union, get_args, get_origin
+import hashlib
+import os
+import sys
+import geography
+from serialization import dumps, loads
+from storage import TABLES
+
+SNAPSHOT_PATH = os.environ.get("DB_SNAPSHOT_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "seed_snapshot.json"))
+DB_SEED = int(os.environ.get("DB_SEED", 2024))
+
+SNAPSHOT_FORMAT = 2
+
+Tables = Dict[str, dict]
+
+def snapshot_key(seed: int, sources: Iterable) -> Optional[dict]:
+    """
+    What a snapshot must have been built from to be reused: sources are the
+    generator functions and constants they read. None if they cannot be fingerprinted
+    """
+    # Compiled code covers the generators' logic and literal data; the Python
+    # version is part of the key because bytecode differs between versions
+    digest = hashlib.sha256(sys.version.encode())
+    try:
+        for source in sources:
+            if callable(source):
+                _hash_code(source.__code__, digest)
+            else:
+                digest.update(repr(source).encode())
+    except AttributeError as e:
+        print(f"Warning: cannot fingerprint the seed generator, skipping the dataset snapshot. Error: {e}")
+        return None
+    for name, (model, _) in TABLES.items():
+        digest.update(f"{name}:{model.__name__}:{[(field, repr(info)) for field, info in model.__fields__.items()]}".encode())
+    return {"format": SNAPSHOT_FORMAT, "seed": seed, "geography": geography.GEOGRAPHY_VERSION, "digest": digest.hexdigest()}
+
+def _hash_code(code: CodeType, digest):
+    """Bytecode, names and constants, recursing into nested functions and comprehensions"""
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            _hash_code(const, digest)
+        else:
+            digest.update(repr(const).encode())
+
+def _field_decoder(annotation) -> Optional[Callable]:
+    """Turns a JSON value back into the field's type (None: already the right type)"""
+    origin = get_origin(annotation)
+    if origin is Union:
+        inner = [_field_decoder(arg) for arg in get_args(annotation) if arg is not type(None)]
+        if len(inner) != 1 or inner[0] is None:
+            return None
+        return lambda value, decode=inner[0]: None if value is None else decode(value)
+    if origin is list:
+        args = get_args(annotation)
+        inner = _field_decoder(args[0]) if args else None
+        return None if inner is None else (lambda values: [inner(value) for value in values])
+    if annotation is datetime:
+        return datetime.fromisoformat
+    if isinstance(annotation, type) and issubclass(annotation, Enum):
+        return annotation
+    return None
+
+def _encode(tables: Tables, key: dict) -> bytes:
+    encoded = {}
+    for name, records in tables.items():
+        model, _ = TABLES[name]
+        fields = list(model.__fields__)
+        encoded[name] = {
+            "fields": fields,
+            "rows": [[record_id] + [getattr(record, field) for field in fields] for record_id, record in records.items()],
+        }
+    return dumps({"key": key, "tables": encoded})
+
+def _decode(payload: dict) -> Tables:
+    tables = {}
+    for name, table in payload["tables"].items():
+        model, _ = TABLES[name]
+        fields = table["fields"]
+        decoders = [_field_decoder(model.__fields__[field].annotation) for field in fields]
+        records = {}
+        for row in table["rows"]:
+            values = {
+                field: value if decode is None else decode(value)
+                for field, decode, value in zip(fields, decoders, row[1:])
+            }
+            # Snapshot rows were validated when generated, so skip re-validation
+            records[row[0]] = model.construct(**values)
+        tables[name] = records
+    return tables
+
+def save_snapshot(tables: Tables, key: dict, path: str = SNAPSHOT_PATH):
+    """Write atomically so concurrently booting workers never read a partial file"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_encode(tables, key))
+    os.replace(tmp_path, path)
+
+def load_snapshot(key: dict, path: str = SNAPSHOT_PATH):
+    """Tables from the snapshot, or None if it is missing or was built from other inputs"""
+    try:
+        with open(path, "rb") as f:
+            payload = loads(f.read())
+        if payload.get("key") != key:
+            return None
+        return _decode(payload)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Warning: could not read dataset snapshot {path}. Error: {e}")
+        return None
+
+def load_or_build(generate: Callable[[int], Tables], sources: Iterable, seed: int = DB_SEED, path: str = SNAPSHOT_PATH) -> Tables:
+    """Load the seed dataset snapshot, generating and saving it first if needed"""
+    key = snapshot_key(seed, sources)
+    if key is None:
+        return generate(seed)
+    tables = load_snapshot(key, path)
+    if tables is not None:
+        return tables
+    tables = generate(seed)
+    try:
+        save_snapshot(tables, key, path)
+    except OSError as e:
+        print(f"Warning: could not write dataset snapshot {path}. Error: {e}")
+    return tables
+
+if __name__ == "__main__":
+    # Rebuild the snapshot, e.g. as a deploy build step: python snapshot.py
+    from database import MockDatabase
+    save_snapshot(MockDatabase.generate_seed_tables(DB_SEED), snapshot_key(DB_SEED, MockDatabase.seed_sources()))
+    print(f"Wrote {SNAPSHOT_PATH} (seed {DB_SEED})")
@@ -0,0 +1,82 @@
+"""
+Grid-based spatial index for property coordinates
+Listings are bucketed into fixed-size lat/lon cells, so radius and bounding-box
+queries only compute distances for listings in nearby cells
+"""
+from typing import Dict, List, Optional, Set, Tuple
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+# ~1.1 km per cell at the equator; Nigeria spans roughly 4-14 degrees north
+CELL_SIZE_DEGREES = 0.01
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+class GridIndex:
+    def __init__(self, cell_size: float = CELL_SIZE_DEGREES):
+        self.cell_size = cell_size
+        self.cells: Dict[Tuple[int, int], Set[str]] = {}
+        self.points: Dict[str, Tuple[float, float]] = {}
+
+    def __len__(self):
+        return len(self.points)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_size), math.floor(lon / self.cell_size))
+
+    def add(self, item_id: str, lat: float, lon: float):
+        self.remove(item_id)
+        self.points[item_id] = (lat, lon)
+        self.cells.setdefault(self._cell(lat, lon), set()).add(item_id)
+
+    def remove(self, item_id: str):
+        point = self.points.pop(item_id, None)
+        if point is None:
+            return
+        cell = self._cell(*point)
+        bucket = self.cells[cell]
+        bucket.discard(item_id)
+        if not bucket:
+            del self.cells[cell]
+
+    def _candidates(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float):
+        lo_row, lo_col = self._cell(min_lat, min_lon)
+        hi_row, hi_col = self._cell(max_lat, max_lon)
+        # Very large boxes: walking occupied cells is cheaper than walking the whole box
+        if (hi_row - lo_row + 1) * (hi_col - lo_col + 1) > len(self.cells):
+            for (row, col), bucket in self.cells.items():
+                if lo_row <= row <= hi_row and lo_col <= col <= hi_col:
+                    yield from bucket
+            return
+        for row in range(lo_row, hi_row + 1):
+            for col in range(lo_col, hi_col + 1):
+                bucket = self.cells.get((row, col))
+                if bucket:
+                    yield from bucket
+
+    def within_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> List[str]:
+        results = []
+        for item_id in self._candidates(min_lat, min_lon, max_lat, max_lon):
+            lat, lon = self.points[item_id]
+            if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon:
+                results.append(item_id)
+        return results
+
+    def within_radius(self, lat: float, lon: float, radius_km: float, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """(item_id, distance_km) pairs within radius_km, nearest first"""
+        d_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+        cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+        d_lon = min(math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)), 180.0)
+
+        results = []
+        for item_id in self._candidates(lat - d_lat, lon - d_lon, lat + d_lat, lon + d_lon):
+            distance = haversine_km(lat, lon, *self.points[item_id])
+            if distance <= radius_km:
+                results.append((item_id, round(distance, 3)))
+        results.sort(key=lambda item: (item[1], item[0]))
+        return results if limit is None else results[:limit]
@@ -0,0 +1,328 @@
+"""
+SQLite storage backend for BODI
+Each MockDatabase table becomes a write-through mapping over a SQLite table in
+WAL mode: reads are served from an in-process mirror (plain dict speed), writes
+are persisted immediately, or grouped into one transaction inside store.batch()
+
+With DB_SHARED=1 several worker processes share one database file: every write
+also appends to a change log, and each worker replays the other workers'
+changes into its mirror (see MockDatabase.sync)
+"""
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from datetime import datetime
+from enum import Enum
+from typing import Dict, Iterable, List, Optional, Tuple, Type
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dotenv import load_dotenv
+from models import *
+
+load_dotenv()
+
+# "memory" (default) keeps everything in dicts; "sqlite" persists to DB_PATH
+DB_BACKEND = os.environ.get("DB_BACKEND", "memory").lower()
+DB_PATH = os.environ.get("DB_PATH", "bodi.db")
+DB_BATCH_SIZE = int(os.environ.get("DB_BATCH_SIZE", 500))
+DB_SHARED = os.environ.get("DB_SHARED", "").lower() in ("1", "true", "yes")
+# Change log rows kept for workers that fall behind (older ones force a full reload)
+CHANGE_LOG_RETENTION = int(os.environ.get("CHANGE_LOG_RETENTION", 10000))
+
+# table -> (model, indexed columns). Indexed columns are copied out of the JSON
+# document so SQLite can answer owner/property/status lookups from an index
+TABLES: Dict[str, Tuple[Type[BaseModel], Tuple[str, ...]]] = {
+    "users": (User, ()),
+    "properties": (Property, ("owner_id",)),
+    "escrow_transactions": (EscrowTransaction, ("property_id", "landlord_id", "status")),
+    "reviews": (Review, ("property_id",)),
+    "location_shares": (LocationShare, ("user_id", "property_id")),
+    "forums": (NeighborhoodForum, ("neighborhood_id",)),
+    "service_providers": (ServiceProvider, ()),
+    "maintenance_requests": (MaintenanceRequest, ("property_id", "status")),
+}
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def _column_value(value):
+    return value.value if isinstance(value, Enum) else value
+
+class SQLiteStore:
+    def __init__(self, path: str = DB_PATH, batch_size: int = DB_BATCH_SIZE, shared: bool = DB_SHARED):
+        self.path = path
+        self.batch_size = batch_size
+        self.shared = shared
+        # Identifies this process's entries in the change log
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.replaying = False
+        # Autocommit mode; batches open their own transaction. The sqlite3 module
+        # keeps compiled statements per SQL string, and every table reuses fixed SQL
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, cached_statements=256)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        # Writers from other workers wait for the lock instead of failing
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.lock = threading.RLock()
+        self._pending: List[Tuple[str, tuple]] = []
+        self._pending_changes: List[Tuple[str, str, str]] = []
+        self._batch_depth = 0
+        self._changes_logged = 0
+        self._create_schema()
+
+    def _create_schema(self):
+        with self.lock:
+            for name, (_, columns) in TABLES.items():
+                column_defs = "".join(f", {column} TEXT" for column in columns)
+                self.conn.execute(f"CREATE TABLE IF NOT EXISTS {name} (id TEXT PRIMARY KEY{column_defs}, data TEXT NOT NULL)")
+                for column in columns:
+                    self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_{column} ON {name} ({column})")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "table_name TEXT NOT NULL, record_id TEXT NOT NULL, origin TEXT NOT NULL)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS idempotency_keys (key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, "
+                "status INTEGER, body BLOB, expires_at REAL NOT NULL)"
+            )
+
+    def table(self, name: str) -> "SQLiteTable":
+        model, columns = TABLES[name]
+        return SQLiteTable(self, name, model, columns)
+
+    def write(self, sql: str, params: tuple, table: str, record_id: str):
+        with self.lock:
+            if self.replaying:
+                return  # applying another worker's change: it is already stored
+            self._pending.append((sql, params))
+            if self.shared:
+                self._pending_changes.append((table, record_id, self.origin))
+            if not self._batch_depth or len(self._pending) >= self.batch_size:
+                self._flush()
+
+    def write_if(self, sql: str, params: tuple, table: str, record_id: str) -> bool:
+        """Run a conditional UPDATE in its own transaction; False if it matched no row"""
+        with self.lock:
+            self._flush()
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                updated = self.conn.execute(sql, params).rowcount > 0
+                if updated and self.shared:
+                    self.conn.execute(
+                        "INSERT INTO changes (table_name, record_id, origin) VALUES (?, ?, ?)", (table, record_id, self.origin)
+                    )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return updated
+
+    @contextmanager
+    def replay(self):
+        """Update in-process mirrors without writing back to the database"""
+        with self.lock:
+            self.replaying = True
+            try:
+                yield
+            finally:
+                self.replaying = False
+
+    @contextmanager
+    def batch(self):
+        """Group every write made inside the block into as few transactions as possible"""
+        with self.lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        changes, self._pending_changes = self._pending_changes, []
+        if len(pending) == 1 and not changes:
+            self.conn.execute(*pending[0])  # autocommit
+            return
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Consecutive writes with the same statement go through one executemany
+            start = 0
+            for end in range(1, len(pending) + 1):
+                if end == len(pending) or pending[end][0] != pending[start][0]:
+                    self.conn.executemany(pending[start][0], [params for _, params in pending[start:end]])
+                    start = end
+            if changes:
+                self.conn.executemany("INSERT INTO changes (table_name, record_id, origin) VALUES (?, ?, ?)", changes)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+        self._changes_logged += len(changes)
+        if self._changes_logged >= CHANGE_LOG_RETENTION // 10:
+            self._changes_logged = 0
+            self.conn.execute("DELETE FROM changes WHERE seq <= (SELECT MAX(seq) FROM changes) - ?", (CHANGE_LOG_RETENTION,))
+
+    # --- CHANGE LOG (shared mode) ---
+    def data_version(self) -> int:
+        """Changes whenever another connection commits to the database file"""
+        with self.lock:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def last_change(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def changes_since(self, seq: int) -> Tuple[List[tuple], bool]:
+        """([(seq, table, record_id, origin)], complete); complete is False if the log was pruned past seq"""
+        with self.lock:
+            oldest = self.conn.execute("SELECT MIN(seq) FROM changes").fetchone()[0]
+            rows = self.conn.execute(
+                "SELECT seq, table_name, record_id, origin FROM changes WHERE seq > ? ORDER BY seq", (seq,)
+            ).fetchall()
+        return rows, oldest is None or oldest <= seq + 1
+
+    # --- IDEMPOTENCY KEYS (see idempotency.py) ---
+    def claim_key(self, key: str, fingerprint: str, expires_at: float) -> Optional[tuple]:
+        """Reserve key, or return the (fingerprint, status, body) already stored for it"""
+        with self.lock:
+            self._flush()
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute("DELETE FROM idempotency_keys WHERE key = ? AND expires_at <= ?", (key, time.time()))
+                row = self.conn.execute("SELECT fingerprint, status, body FROM idempotency_keys WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self.conn.execute(
+                        "INSERT INTO idempotency_keys (key, fingerprint, expires_at) VALUES (?, ?, ?)", (key, fingerprint, expires_at)
+                    )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return row
+
+    def complete_key(self, key: str, status: int, body: bytes, expires_at: float):
+        with self.lock:
+            self._flush()
+            self.conn.execute(
+                "UPDATE idempotency_keys SET status = ?, body = ?, expires_at = ? WHERE key = ?", (status, body, expires_at, key)
+            )
+
+    def release_key(self, key: str):
+        with self.lock:
+            self.conn.execute("DELETE FROM idempotency_keys WHERE key = ? AND status IS NULL", (key,))
+
+    def prune_keys(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM idempotency_keys WHERE expires_at <= ?", (time.time(),))
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self.conn.close()
+
+class SQLiteTable(MutableMapping):
+    """Dict-like table: lookups hit the in-process mirror, writes go through to SQLite"""
+
+    def __init__(self, store: SQLiteStore, name: str, model: Type[BaseModel], columns: Tuple[str, ...]):
+        self.store = store
+        self.name = name
+        self.model = model
+        self.columns = columns
+
+        names = ", ".join(("id",) + columns + ("data",))
+        placeholders = ", ".join("?" * (len(columns) + 2))
+        assignments = ", ".join(f"{column} = excluded.{column}" for column in columns + ("data",))
+        # Upserts keep the rowid, so iteration order matches dict insertion order
+        self._upsert_sql = f"INSERT INTO {name} ({names}) VALUES ({placeholders}) ON CONFLICT(id) DO UPDATE SET {assignments}"
+        self._delete_sql = f"DELETE FROM {name} WHERE id = ?"
+        self.reload()
+
+    def reload(self):
+        """Re-read the whole table into the mirror"""
+        with self.store.lock:
+            rows = self.store.conn.execute(f"SELECT id, data FROM {self.name} ORDER BY rowid").fetchall()
+        self._rows = {record_id: self.model(**json.loads(data)) for record_id, data in rows}
+
+    def fetch(self, key):
+        """The stored record for key, read from SQLite (None if deleted); the mirror is not touched"""
+        with self.store.lock:
+            row = self.store.conn.execute(f"SELECT data FROM {self.name} WHERE id = ?", (key,)).fetchone()
+        return None if row is None else self.model(**json.loads(row[0]))
+
+    def __getitem__(self, key):
+        return self._rows[key]
+
+    def _params(self, key, record) -> tuple:
+        values = tuple(_column_value(getattr(record, column)) for column in self.columns)
+        return (key,) + values + (json.dumps(record.dict(), default=_json_default),)
+
+    def __setitem__(self, key, record):
+        self._rows[key] = record
+        self.store.write(self._upsert_sql, self._params(key, record), self.name, key)
+
+    def swap(self, key, record, version: int, statuses: Iterable[str]) -> bool:
+        """
+        Compare-and-swap: store record only if the stored one is still at version
+        with one of statuses (checked by SQLite, so it holds across worker processes)
+        """
+        statuses = [_column_value(status) for status in statuses]
+        if not statuses:
+            return False
+        assignments = ", ".join(f"{column} = ?" for column in self.columns + ("data",))
+        sql = (
+            f"UPDATE {self.name} SET {assignments} WHERE id = ? AND json_extract(data, '$.version') = ? "
+            f"AND status IN ({', '.join('?' * len(statuses))})"
+        )
+        params = self._params(key, record)
+        if not self.store.write_if(sql, params[1:] + (key, version) + tuple(statuses), self.name, key):
+            return False
+        self._rows[key] = record
+        return True
+
+    def __delitem__(self, key):
+        del self._rows[key]
+        self.store.write(self._delete_sql, (key,), self.name, key)
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def keys(self):
+        return self._rows.keys()
+
+    def values(self):
+        return self._rows.values()
+
+    def items(self):
+        return self._rows.items()
+
+    def get(self, key, default=None):
+        return self._rows.get(key, default)
+
+    def where(self, column: str, value) -> List[str]:
+        """IDs whose indexed column equals value, answered by SQLite (in insertion order)"""
+        if column not in self.columns:
+            raise KeyError(f"{self.name}.{column} is not an indexed column")
+        with self.store.lock:
+            self.store._flush()
+            rows = self.store.conn.execute(
+                f"SELECT id FROM {self.name} WHERE {column} = ? ORDER BY rowid", (_column_value(value),)
+            ).fetchall()
+        return [record_id for record_id, in rows]
@@ -0,0 +1,162 @@
+"""
+Listing query engines checked against a brute-force scan
+PropertyIndex.query, PropertyColumns.query and MockDatabase.query_properties
+(with its result cache) must return the same pages, in the same order, as
+filtering and sorting every listing by hand, for random filter/sort/limit
+combinations followed cursor by cursor to the end
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from database import MockDatabase
+from models import PropertyType
+from property_index import SORT_FIELDS, parse_location
+
+COMBINATIONS = 400
+SORTS = [None] + [name for field in SORT_FIELDS for name in (field, f"-{field}")]
+LIMITS = [None, 1, 2, 3, 7, 25]
+
+
+@pytest.fixture(scope="module")
+def db():
+    return MockDatabase()
+
+
+def expected_ids(db, filters, location=None):
+    """Every matching listing, sorted the way the engines order them"""
+    cities = {parse_location(p)[0].lower() for p in db.properties.values()}
+    rows = []
+    for pid, prop in db.properties.items():
+        if location is not None and not _in_place(prop, location, cities):
+            continue
+        if filters.get("candidates") is not None and pid not in filters["candidates"]:
+            continue
+        if filters.get("min_price") is not None and prop.price_ngn < filters["min_price"]:
+            continue
+        if filters.get("max_price") is not None and prop.price_ngn > filters["max_price"]:
+            continue
+        if filters.get("verified_only") and not prop.verified:
+            continue
+        if filters.get("types") and prop.type.value not in filters["types"]:
+            continue
+        amenities = {a.lower() for a in prop.amenities}
+        if any(a.lower() not in amenities for a in filters.get("amenities") or ()):
+            continue
+        if filters.get("min_bedrooms") is not None and (prop.bedrooms is None or prop.bedrooms < filters["min_bedrooms"]):
+            continue
+        sort = filters.get("sort") or ""
+        field = SORT_FIELDS.get(sort.lstrip("-"))
+        value = getattr(prop, field) if field else db.property_index.seq(pid)
+        rows.append((value, pid))
+    rows.sort(reverse=(filters.get("sort") or "").startswith("-"))
+    return [pid for _, pid in rows]
+
+
+def _in_place(prop, location, cities):
+    city, neighborhood, _ = parse_location(prop)
+    parts = [part.strip().lower() for part in location.split(",")]
+    if len(parts) > 1:
+        return (neighborhood or "").lower() == parts[0] and city.lower() == parts[-1]
+    if parts[0] in cities:
+        return city.lower() == parts[0]
+    return (neighborhood or "").lower() == parts[0]
+
+
+def random_filters(rng, db):
+    """A random filter/sort/limit combination over the current catalogue"""
+    props = list(db.properties.values())
+    prices = sorted(p.price_ngn for p in props)
+    amenities = sorted({a for p in props for a in p.amenities})
+    filters = {"sort": rng.choice(SORTS), "limit": rng.choice(LIMITS)}
+    if rng.random() < 0.4:
+        filters["min_price"] = rng.choice(prices)
+    if rng.random() < 0.4:
+        filters["max_price"] = rng.choice(prices)
+    if rng.random() < 0.3:
+        filters["verified_only"] = True
+    if rng.random() < 0.3:
+        filters["types"] = rng.sample([t.value for t in PropertyType], rng.randint(1, 3))
+    if rng.random() < 0.3:
+        # Mixed case, and now and then an amenity no listing has
+        picked = rng.sample(amenities, rng.randint(1, 2))
+        filters["amenities"] = [a.upper() if rng.random() < 0.5 else a for a in picked]
+        if rng.random() < 0.1:
+            filters["amenities"].append("Helipad")
+    if rng.random() < 0.3:
+        filters["min_bedrooms"] = rng.randint(0, 5)
+    return filters
+
+
+def random_location(rng, db):
+    prop = rng.choice(list(db.properties.values()))
+    city, neighborhood, _ = parse_location(prop)
+    return rng.choice([city, neighborhood or city, f"{neighborhood or city}, {city}"])
+
+
+def collect_pages(query, filters):
+    """Follow cursors to the end; returns every ID in page order"""
+    ids, cursor, pages = [], None, 0
+    while True:
+        page, cursor = query(**{**filters, "cursor": cursor})
+        if filters.get("limit") is not None:
+            assert len(page) <= filters["limit"]
+        ids.extend(page)
+        pages += 1
+        assert pages <= len(ids) + 1, "cursor did not advance"
+        if cursor is None:
+            return ids
+
+
+def db_query(db, location=None):
+    def query(**filters):
+        props, cursor = db.query_properties(location, **filters)
+        return [p.id for p in props], cursor
+    return query
+
+
+def test_engines_match_brute_force(db):
+    rng = random.Random(2024)
+    for _ in range(COMBINATIONS):
+        filters = random_filters(rng, db)
+        if rng.random() < 0.25:
+            filters["candidates"] = set(rng.sample(sorted(db.properties), rng.randint(0, 30)))
+        expected = expected_ids(db, filters)
+        assert collect_pages(db.property_index.query, filters) == expected, filters
+        assert collect_pages(db.property_columns.query, filters) == expected, filters
+        assert collect_pages(db_query(db), filters) == expected, filters
+
+
+def test_location_queries_match_brute_force(db):
+    rng = random.Random(7)
+    for _ in range(COMBINATIONS // 4):
+        location = random_location(rng, db)
+        filters = random_filters(rng, db)
+        expected = expected_ids(db, filters, location)
+        # Twice: the second run is served from the result cache
+        assert collect_pages(db_query(db, location), filters) == expected, (location, filters)
+        assert collect_pages(db_query(db, location), filters) == expected, (location, filters)
+
+
+def test_query_cache_follows_interleaved_writes():
+    db = MockDatabase()
+    rng = random.Random(11)
+    ids = sorted(db.properties)
+    places = sorted({p.location for p in db.properties.values()})
+    queries = [(random_location(rng, db), random_filters(rng, db)) for _ in range(20)]
+    queries += [(None, random_filters(rng, db)) for _ in range(20)]
+    for step in range(300):
+        pid = rng.choice(ids)
+        change = rng.choice([
+            {"price_ngn": float(rng.choice([500000, 1000000, 2500000]))},  # ties exercise ID ordering
+            {"verified": not db.properties[pid].verified},
+            {"bedrooms": rng.choice([None, 0, 2, 4])},
+            {"location": rng.choice(places)},
+        ])
+        db.update_property(pid, change)
+        location, filters = queries[step % len(queries)]
+        expected = expected_ids(db, filters, location)
+        assert collect_pages(db_query(db, location), filters) == expected, (step, change, location, filters)
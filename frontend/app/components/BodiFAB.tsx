@@ -106,24 +106,62 @@ export default function BodiFAB() {
         try {
             const contextMessages = [...messages, userMsg].slice(-10);
 
-            const res = await fetch(getApiUrl('/api/chat'), {
+            const res = await fetch(getApiUrl('/api/chat/stream'), {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({ messages: contextMessages, language: language })
             });
 
-            const data = await res.json();
-
-            if (res.ok) {
-                const propertyIds = extractPropertyRecommendations(data.response);
-                setMessages(prev => [...prev, {
-                    role: 'assistant',
-                    content: data.response,
-                    properties: propertyIds
-                }]);
-            } else {
+            if (!res.ok || !res.body) {
                 setMessages(prev => [...prev, { role: 'assistant', content: "My connection is a bit weak. Please try again." }]);
+                return;
             }
+
+            // Read Server-Sent Events and grow the reply as tokens arrive
+            const reader = res.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let reply = '';
+            let started = false;
+
+            const showReply = (content: string) => {
+                if (!started) {
+                    started = true;
+                    setIsLoading(false);
+                    setMessages(prev => [...prev, { role: 'assistant', content }]);
+                } else {
+                    setMessages(prev => [...prev.slice(0, -1), { role: 'assistant', content }]);
+                }
+            };
+
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+
+                const events = buffer.split('\n\n');
+                buffer = events.pop() || '';
+                for (const rawEvent of events) {
+                    const dataLine = rawEvent.split('\n').find(line => line.startsWith('data: '));
+                    if (!dataLine) continue;
+                    const data = JSON.parse(dataLine.slice(6));
+                    if (data.token) {
+                        reply += data.token;
+                        showReply(reply);
+                    } else if (data.error) {
+                        reply = reply || data.error;
+                        showReply(reply);
+                    }
+                }
+            }
+
+            // Attach property cards once the full reply is in
+            const propertyIds = extractPropertyRecommendations(reply);
+            setMessages(prev => [...prev.slice(0, started ? -1 : prev.length), {
+                role: 'assistant',
+                content: reply || "My connection is a bit weak. Please try again.",
+                properties: propertyIds
+            }]);
         } catch (error) {
             console.error("Chat Error:", error);
             setMessages(prev => [...prev, { role: 'assistant', content: "Network error. Please check your connection." }]);
@@ -29,6 +29,7 @@ export const API_ENDPOINTS = {
 
     // Chat
     chat: '/api/chat',
+    chatStream: '/api/chat/stream',
 
     // Search
     search: '/api/search'